@@ -0,0 +1,14 @@
+from apps.core.async_api import async_api_view
+from apps.core.pagination import CreatedAtCursorPagination
+from .serializers import CommentSerializer
+from .views import visible_comments
+
+# Async version of CommentViewSet.list for ASGI; same query, same JSON
+
+
+@async_api_view()
+async def comment_list(request):
+    paginator = CreatedAtCursorPagination()
+    page = await paginator.apaginate_queryset(visible_comments(request.user, request.query_params), request)
+    serializer = CommentSerializer(page, many=True, context={'request': request})
+    return paginator.get_paginated_data(serializer.data)
@@ -3,6 +3,9 @@ from django.conf import settings
 from apps.posts.models import Post
 from django.core.exceptions import ValidationError
 
+MAX_THREAD_DEPTH = 3
+PATH_SEGMENT_WIDTH = 12
+
 class Comment(models.Model):
     author = models.ForeignKey(
         settings.AUTH_USER_MODEL,
@@ -28,6 +31,19 @@ class Comment(models.Model):
         related_name='replies'
     )
 
+    # Ancestor ids from the root down to this comment, zero-padded, e.g. '000000000004/000000000009/'.
+    # Ordering a post's comments by path yields every thread depth-first in one range scan.
+    path = models.CharField(
+        max_length=(PATH_SEGMENT_WIDTH + 1) * (MAX_THREAD_DEPTH + 1),
+        blank=True,
+        editable=False
+    )
+
+    depth = models.PositiveSmallIntegerField(
+        default=0,
+        editable=False
+    )
+
     created_at = models.DateTimeField(
         auto_now_add=True
     )
@@ -37,42 +53,44 @@ class Comment(models.Model):
     )
 
     class Meta:
-        ordering = ['-created_at']
+        ordering = ['-created_at', '-id']
         indexes = [
-            models.Index(fields=['post', '-created_at']),
-            models.Index(fields=['parent'])
+            models.Index(fields=['-created_at', '-id']),
+            models.Index(fields=['post', '-created_at', '-id']),
+            models.Index(fields=['parent']),
+            models.Index(fields=['post', 'path'])
         ]
 
     def clean(self):
-        if self.post.visibility == 'private' and self.post.author != self.author:
-            if not self.post.author.followers.filter(from_user=self.author).exists():
-                raise ValidationError(
-                    "Cannot comment in private posts."
-                )
-        
-        if self.parent:
-            depth = 0
-            current = self.parent
-            while current.parent and depth < 3:
-                current = current.parent
-                depth += 1
-            if depth >= 3:
-                raise ValidationError(
-                    "Maximum nesting depth reached."
-                )
+        if not self.post.is_visible_to(self.author):
+            raise ValidationError(
+                "Cannot comment on a post you can't see."
+            )
+
+        if self.parent and self.parent.depth >= MAX_THREAD_DEPTH:
+            raise ValidationError(
+                "Maximum nesting depth reached."
+            )
+
+    def save(self, *args, **kwargs):
+        # depth and path are fixed at creation; an update never moves the comment
+        if self._state.adding:
+            self.depth = self.parent.depth + 1 if self.parent_id else 0
+        super().save(*args, **kwargs)
+        # The path ends with our own id, so it can only be written once we have one
+        if not self.path:
+            prefix = self.parent.path if self.parent_id else ''
+            self.path = f'{prefix}{self.pk:0{PATH_SEGMENT_WIDTH}d}/'
+            Comment.objects.filter(pk=self.pk).update(path=self.path)
 
     @property
     def is_reply(self):
-        return self.parent is not None
+        # parent_id: no query for the parent row
+        return self.parent_id is not None
     
     @property
     def get_thread_depth(self):
-        depth = 0
-        current = self.parent
-        while current:
-            depth += 1
-            current = current.parent
-        return depth
+        return self.depth
     
     @property
     def get_description(self):
@@ -1,8 +1,9 @@
 from rest_framework import serializers
-from .models import Comment
+from .models import Comment, MAX_THREAD_DEPTH
 from apps.users.serializers import PublicUserSerializer
+from apps.core.serializers import SparseFieldsMixin
 
-class CommentSerializer(serializers.ModelSerializer):
+class CommentSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     author = PublicUserSerializer(read_only=True)
     replies_count = serializers.SerializerMethodField()
     is_reply = serializers.ReadOnlyField()
@@ -24,9 +25,12 @@ class CommentSerializer(serializers.ModelSerializer):
         ]
 
         read_only_fields = ['id', 'created_at', 'updated_at', 'author']
+        expandable_fields = {'post': ('apps.posts.serializers.PostListSerializer', {})}
 
     def get_replies_count(self, obj):
-        return obj.replies.count()
+        # Annotated by CommentViewSet so a page doesn't count replies row by row
+        count = getattr(obj, 'num_replies', None)
+        return obj.replies.count() if count is None else count
     
     def validate_content(self, value):
         if len(value.strip()) < 1:
@@ -39,4 +43,33 @@ class CommentSerializer(serializers.ModelSerializer):
                 "Comment too long. (max 280 characters)"
             )
         
-        return value
\ No newline at end of file
+        return value
+
+    def validate(self, attrs):
+        if self.instance is not None:
+            # path and depth are written once, so a comment stays where it was posted
+            for field in ('post', 'parent'):
+                if field in attrs and getattr(attrs[field], 'pk', None) != getattr(self.instance, f'{field}_id'):
+                    raise serializers.ValidationError({
+                        field: "Cannot be changed after the comment is posted."
+                    })
+            return attrs
+
+        # Same rule as visible_to(); a post the author can't see reads as missing
+        post = attrs['post']
+        if not post.is_visible_to(self.context['request'].user):
+            raise serializers.ValidationError({
+                'post': f'Invalid pk "{post.pk}" - object does not exist.'
+            })
+
+        parent = attrs.get('parent')
+        if parent is not None:
+            if parent.post_id != post.id:
+                raise serializers.ValidationError({
+                    'parent': "Reply must be on the same post as its parent."
+                })
+            if parent.depth >= MAX_THREAD_DEPTH:
+                raise serializers.ValidationError({
+                    'parent': "Maximum nesting depth reached."
+                })
+        return attrs
@@ -1,3 +1,98 @@
-from django.test import TestCase
+from apps.core.testing import SeededAPITestCase
+from apps.posts.models import Post
+from apps.users.models import User
+from .models import Comment
 
-# Create your tests here.
+
+class CommentQueryCountTests(SeededAPITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        public = Post.objects.filter(visibility='public')
+        cls.busy = public.order_by('-comments_count').first()
+        cls.quiet = public.filter(comments_count=1).first()
+        cls.reader = User.objects.exclude(pk=cls.busy.author_id).first()
+
+    def test_list(self):
+        url = f'/api/comments/comments/?post={self.busy.id}'
+        self.assertMaxQueries(1, url)
+        self.assertMaxQueries(1, url, self.reader)
+        self.assertMaxQueries(1, f'{url}&fields=id,content', self.reader)
+        self.assertMaxQueries(1, f'{url}&expand=post', self.reader)
+
+    def test_list_does_not_scale_with_page_size(self):
+        url = f'/api/comments/comments/?post={self.busy.id}'
+        self.assertQueriesConstant(url, self.reader)
+        self.assertQueriesConstant(f'{url}&expand=post', self.reader)
+        self.assertQueriesConstant(f'/api/comments/async/comments/?post={self.busy.id}', self.reader)
+
+    def test_thread_does_not_scale_with_comments(self):
+        self.assertTrue(self.busy.comments_count > 5 * self.quiet.comments_count)
+        counts = []
+        for post in (self.quiet, self.busy):
+            response, queries = self.request('get', f'/api/comments/comments/thread/?post={post.id}', self.reader)
+            self.assertEqual(response.status_code, 200)
+            counts.append(len(queries))
+        self.assertEqual(counts[0], counts[1])
+        self.assertLessEqual(counts[1], 2)
+
+    def test_retrieve(self):
+        comment = Comment.objects.filter(post=self.busy).first()
+        self.assertMaxQueries(1, f'/api/comments/comments/{comment.id}/?post={self.busy.id}', self.reader)
+
+    def test_create(self):
+        parent = Comment.objects.filter(post=self.busy, depth=0).first()
+        data = {'post': self.busy.id, 'parent': parent.id, 'content': 'agreed'}
+        self.assertMaxQueries(9, '/api/comments/comments/', self.reader, method='post', status=201, data=data)
+
+
+class CommentThreadTests(SeededAPITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        public = Post.objects.filter(visibility='public').order_by('-comments_count')
+        cls.post, cls.other = public[0], public[1]
+        cls.reader = User.objects.exclude(pk=cls.post.author_id).first()
+
+    def thread(self, post):
+        response = self.request('get', f'/api/comments/comments/thread/?post={post.id}', self.reader)[0]
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_reply_to_a_comment_on_another_post_is_rejected(self):
+        parent = Comment.objects.filter(post=self.other).first()
+        data = {'post': self.post.id, 'parent': parent.id, 'content': 'misplaced'}
+        response = self.request('post', '/api/comments/comments/', self.reader, data=data)[0]
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('parent', response.json())
+        self.thread(self.post)
+
+    def test_parent_cannot_change(self):
+        old, new = Comment.objects.filter(post=self.post, depth=0).order_by('created_at')[:2]
+        response = self.request(
+            'patch', f'/api/comments/comments/{old.id}/?post={self.post.id}', self.reader, data={'parent': new.id}
+        )[0]
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('parent', response.json())
+        old.refresh_from_db()
+        self.assertIsNone(old.parent_id)
+
+    def test_edit_keeps_path_and_depth(self):
+        reply = Comment.objects.filter(post=self.post, depth=1).first()
+        response = self.request(
+            'patch', f'/api/comments/comments/{reply.id}/?post={self.post.id}', self.reader, data={'content': 'edited'}
+        )[0]
+        self.assertEqual(response.status_code, 200)
+        edited = Comment.objects.get(pk=reply.pk)
+        self.assertEqual((edited.path, edited.depth), (reply.path, reply.depth))
+
+    def test_thread_nests_every_comment(self):
+        roots = self.thread(self.post)
+
+        def walk(items, depth):
+            for item in items:
+                self.assertEqual(item['thread_depth'], depth)
+                yield item
+                yield from walk(item['replies'], depth + 1)
+
+        self.assertEqual(len(list(walk(roots, 0))), Comment.objects.filter(post=self.post).count())
@@ -1,10 +1,13 @@
 from rest_framework.routers import DefaultRouter
 from .views import CommentViewSet
+from . import async_views
 from django.urls import include, path
 
 router = DefaultRouter()
 router.register(r'comments', CommentViewSet, basename='comment')
 
 urlpatterns = [
-    path('', include(router.urls))
+    path('', include(router.urls)),
+    # Native async read for ASGI deployments
+    path('async/comments/', async_views.comment_list, name='async_comment_list')
 ]
@@ -1,28 +1,87 @@
 from rest_framework import viewsets, permissions
 from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound, ValidationError
 from .models import Comment
+from apps.posts.models import Post
 from .serializers import CommentSerializer
 from rest_framework.response import Response
+from django.db import transaction
+from django.db.models import Count, Exists, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from apps.core.serializers import expands, wants
+
+def visible_comments(user, params):
+    # Checked per comment against its own post, never by listing every visible post id
+    queryset = Comment.objects.filter(Exists(Post.objects.visible_to(user).filter(pk=OuterRef('post_id'))))
+    # Join and annotate only what ?fields= / ?expand= will render
+    if wants(params, 'author'):
+        queryset = queryset.select_related('author__stats')
+    if expands(params, 'post'):
+        queryset = queryset.select_related('post__author')
+    if wants(params, 'replies_count'):
+        # Counted per page row on the parent index; a JOIN + GROUP BY would sort every comment of the post
+        replies = (
+            Comment.objects.filter(parent=OuterRef('pk')).order_by()
+            .values('parent').annotate(n=Count('pk')).values('n')
+        )
+        queryset = queryset.annotate(num_replies=Coalesce(Subquery(replies), 0))
+    try:
+        post_id = params.get('post')
+        post_id = int(post_id)
+        if post_id:
+            return queryset.filter(post_id=post_id).order_by('-created_at', '-id')
+        return queryset
+    
+    except (TypeError, ValueError):
+        return Comment.objects.none()
 
 class CommentViewSet(viewsets.ModelViewSet):
     serializer_class = CommentSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
 
     def get_queryset(self):
-        try:
-            post_id = self.request.query_params.get('post')
-            post_id = int(post_id)
-            if post_id:
-                return Comment.objects.filter(post_id=post_id).order_by('-created_at')
-            return Comment.objects.all()
-        
-        except (TypeError, ValueError):
-            return Comment.objects.none()
+        return visible_comments(self.request.user, self.request.query_params)
     
+    # Comment rows and Post.comments_count change in one transaction
     def perform_create(self, serializer):
-        serializer.save(author=self.request.user)
+        with transaction.atomic():
+            serializer.save(author=self.request.user)
+
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            instance.delete()
 
     @action(detail=True, methods=['post'])
     def report(self, request, pk=None):
         comment = self.get_object()
-        return Response({'status': 'comment reported'})
\ No newline at end of file
+        return Response({'status': 'comment reported'})
+
+    @action(detail=False, methods=['get'])
+    def thread(self, request):
+        # Whole comment tree of a post: one range query on (post, path), assembled in O(n)
+        try:
+            post_id = int(request.query_params.get('post'))
+        except (TypeError, ValueError):
+            raise ValidationError({'post': 'A valid post id is required.'})
+
+        if not Post.objects.visible_to(request.user).filter(pk=post_id).exists():
+            raise NotFound()
+        comments = list(
+            Comment.objects.filter(post_id=post_id).select_related('author__stats').order_by('path')
+        )
+        children = {}
+        for comment in comments:
+            children[comment.parent_id] = children.get(comment.parent_id, 0) + 1
+        for comment in comments:
+            comment.num_replies = children.get(comment.id, 0)
+
+        nodes, roots = {}, []
+        for comment, item in zip(comments, self.get_serializer(comments, many=True).data):
+            item['replies'] = []
+            nodes[comment.id] = item
+            # Path order guarantees a parent is placed before any of its replies;
+            # a row whose parent isn't in this thread is shown at the top level
+            parent = nodes.get(comment.parent_id)
+            siblings = parent['replies'] if parent is not None else roots
+            siblings.append(item)
+        return Response(roots)
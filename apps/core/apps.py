@@ -0,0 +1,13 @@
+from django.apps import AppConfig
+
+
+class CoreConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'apps.core'
+
+    def ready(self):
+        from django.db.backends.signals import connection_created
+        from .metrics import install_query_counter
+        from .middleware import install_query_recorder
+        connection_created.connect(install_query_counter)
+        connection_created.connect(install_query_recorder)
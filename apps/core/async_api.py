@@ -0,0 +1,63 @@
+import functools
+
+from asgiref.sync import sync_to_async
+from django.http import Http404, HttpResponse
+from django.views.decorators.http import require_http_methods
+from rest_framework import exceptions
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+from .renderers import ORJSONRenderer
+
+
+def render(data, status=200, headers=None):
+    # Same renderer, so the same bytes, as the sync views
+    return HttpResponse(
+        ORJSONRenderer().render(data),
+        status=status,
+        content_type='application/json',
+        headers=headers
+    )
+
+
+def _error(exc, request):
+    headers = None
+    if isinstance(exc, (exceptions.NotAuthenticated, exceptions.AuthenticationFailed)):
+        # As APIView.handle_exception: 401 with a challenge if the first authenticator has one
+        header = request.authenticators[0].authenticate_header(request) if request.authenticators else None
+        if header:
+            headers = {'WWW-Authenticate': header}
+        else:
+            exc.status_code = 403
+    detail = exc.detail if isinstance(exc.detail, (list, dict)) else {'detail': exc.detail}
+    return render(detail, status=exc.status_code, headers=headers)
+
+
+def async_api_view(methods=('GET',), authenticated=False):
+    """
+    Native async counterpart of a read-only DRF view.
+
+    Authenticates with the configured DRF authentication classes, hands the
+    view a DRF ``Request`` (for ``query_params`` and serializer context) and
+    turns API exceptions into the same JSON error bodies DRF returns.
+    """
+    def decorator(view):
+        @require_http_methods(list(methods))
+        @functools.wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            drf_request = Request(
+                request,
+                authenticators=[auth() for auth in api_settings.DEFAULT_AUTHENTICATION_CLASSES]
+            )
+            try:
+                # Authentication may hit the database, so it runs in the sync thread
+                user = await sync_to_async(lambda: drf_request.user)()
+                if authenticated and not user.is_authenticated:
+                    raise exceptions.NotAuthenticated()
+                data = await view(drf_request, *args, **kwargs)
+            except Http404 as exc:
+                return _error(exceptions.NotFound(str(exc) or None), drf_request)
+            except exceptions.APIException as exc:
+                return _error(exc, drf_request)
+            return data if isinstance(data, HttpResponse) else render(data)
+        return wrapper
+    return decorator
@@ -0,0 +1,119 @@
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.db import DEFAULT_DB_ALIAS
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from . import metrics
+
+# The only user fields views read off request.user; the rest stay deferred
+USER_FIELDS = ('id', 'username', 'role', 'is_active', 'is_staff')
+CLAIM_FIELDS = USER_FIELDS[1:]
+
+
+def add_user_claims(token, user):
+    for field in CLAIM_FIELDS:
+        token[field] = getattr(user, field)
+    return token
+
+
+class UserCache:
+    """
+    Small process-local cache of ``USER_FIELDS`` rows with a TTL.
+
+    Saves to a User drop its entry in this process (see apps.users.signals);
+    other processes pick the change up once the entry is ``ttl`` seconds old.
+    """
+
+    def __init__(self, max_entries=10000, ttl=60):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()  # user_id -> (values, loaded_at)
+        self._lock = threading.Lock()
+
+    def get(self, user_id):
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return None
+            if time.monotonic() - entry[1] > self.ttl:
+                del self._entries[user_id]
+                return None
+            self._entries.move_to_end(user_id)
+            return entry[0]
+
+    def set(self, user_id, values):
+        with self._lock:
+            self._entries[user_id] = (values, time.monotonic())
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+user_cache = UserCache(
+    max_entries=getattr(settings, 'AUTH_USER_CACHE_MAX_ENTRIES', 10000),
+    ttl=getattr(settings, 'AUTH_USER_CACHE_TTL', 60)
+)
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication that doesn't load the User row on every request.
+
+    The fields in ``USER_FIELDS`` come from ``user_cache`` (one query on a
+    miss) or, with ``JWT_AUTH_STATELESS``, from the claims added at login by
+    ``add_user_claims``. The request user is built with ``from_db`` so any
+    other field is loaded from the database on first access.
+    """
+
+    def get_user(self, validated_token):
+        if api_settings.CHECK_REVOKE_TOKEN:
+            # Needs the password hash, which isn't cached
+            return super().get_user(validated_token)
+        user_model = get_user_model()
+        try:
+            # The claim may be a string; the cache is keyed like instance.pk
+            user_id = user_model._meta.pk.to_python(validated_token[api_settings.USER_ID_CLAIM])
+        except (KeyError, ValidationError):
+            raise InvalidToken(_('Token contained no recognizable user identification'))
+
+        values = None
+        if getattr(settings, 'JWT_AUTH_STATELESS', False):
+            if all(claim in validated_token for claim in CLAIM_FIELDS):
+                values = (user_id, *(validated_token[claim] for claim in CLAIM_FIELDS))
+        if values is None:
+            values = self._load(user_id)
+
+        fields = dict(zip(USER_FIELDS, values))
+        if api_settings.CHECK_USER_IS_ACTIVE and not fields['is_active']:
+            raise AuthenticationFailed(_('User is inactive'), code='user_inactive')
+        # from_db expects values in concrete field order
+        names = [f.attname for f in user_model._meta.concrete_fields if f.attname in fields]
+        return user_model.from_db(DEFAULT_DB_ALIAS, names, [fields[name] for name in names])
+
+    def _load(self, user_id):
+        values = user_cache.get(user_id)
+        metrics.cache_lookup('auth_user', values is not None)
+        if values is None:
+            user_model = get_user_model()
+            values = user_model.objects.filter(
+                **{api_settings.USER_ID_FIELD: user_id}
+            ).values_list(*USER_FIELDS).first()
+            if values is None:
+                raise AuthenticationFailed(_('User not found'), code='user_not_found')
+            user_cache.set(user_id, values)
+        return values
@@ -0,0 +1,79 @@
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from . import metrics
+
+
+def _cache():
+    return caches[getattr(settings, 'RESPONSE_CACHE_ALIAS', 'default')]
+
+
+def _label(model):
+    return model if isinstance(model, str) else model._meta.label_lower
+
+
+def version_key(model, pk):
+    return f'version:{_label(model)}:{pk}'
+
+
+def _new_version():
+    # Not 1: a version that was evicted must not come back as one a stale body was stored under
+    return time.time_ns()
+
+
+def get_versions(keys):
+    cache = _cache()
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            cache.add(key, _new_version(), timeout=None)
+            versions[key] = cache.get(key)
+    return versions
+
+
+def bump(model, pk):
+    cache = _cache()
+    key = version_key(model, pk)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, _new_version(), timeout=None)
+
+
+def bump_on_commit(model, pk):
+    # After commit, so a reader can't cache the old row under the new version
+    transaction.on_commit(lambda: bump(model, pk))
+
+
+def body_key(name, pk, variant):
+    return f'body:{name}:{pk}:{variant}'
+
+
+def get_body(name, pk, variant=''):
+    """
+    Return the cached body for ``(name, pk)``, or None.
+
+    A body is stored with the versions of every row it was built from and is
+    only returned while all of them are still current.
+    """
+    entry = _cache().get(body_key(name, pk, variant))
+    if entry is not None:
+        data, versions = entry
+        if _cache().get_many(list(versions)) == versions:
+            metrics.cache_lookup('response', True)
+            return data
+    metrics.cache_lookup('response', False)
+    return None
+
+
+def set_body(name, pk, data, versions, variant=''):
+    # ``versions`` must be read before the rows the body was built from
+    timeout = getattr(settings, 'RESPONSE_CACHE_TIMEOUT', 300)
+    _cache().set(body_key(name, pk, variant), (data, versions), timeout)
+
+
+def request_variant(request):
+    # Bodies hold absolute media URLs, so they differ per scheme and host
+    return f'{request.scheme}://{request.get_host()}'
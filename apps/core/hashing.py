@@ -0,0 +1,77 @@
+import asyncio
+import multiprocessing
+import os
+import threading
+import weakref
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth import hashers
+
+
+def _init_worker(settings_module):
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', settings_module)
+    import django
+    django.setup()
+
+
+def _make_password(raw_password):
+    return hashers.make_password(raw_password)
+
+
+def _check_password(raw_password, encoded):
+    # (matches, upgraded hash or None) so the caller can save a rehash like check_password's setter
+    if not hashers.check_password(raw_password, encoded):
+        return False, None
+    if hashers.identify_hasher(encoded).must_update(encoded):
+        return True, hashers.make_password(raw_password)
+    return True, None
+
+
+_pool = None
+_pool_lock = threading.Lock()
+_semaphores = weakref.WeakKeyDictionary()  # event loop -> asyncio.Semaphore
+
+
+def _get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=getattr(settings, 'PASSWORD_HASH_WORKERS', 2),
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_worker,
+                initargs=(os.environ.get('DJANGO_SETTINGS_MODULE', 'config.settings'),)
+            )
+        return _pool
+
+
+def _get_semaphore():
+    # One per event loop: under WSGI every async view runs in a loop of its own
+    loop = asyncio.get_running_loop()
+    semaphore = _semaphores.get(loop)
+    if semaphore is None:
+        semaphore = _semaphores[loop] = asyncio.Semaphore(getattr(settings, 'PASSWORD_HASH_CONCURRENCY', 4))
+    return semaphore
+
+
+async def _run(func, *args):
+    if not getattr(settings, 'PASSWORD_HASH_OFFLOAD', True):
+        return func(*args)
+    async with _get_semaphore():
+        return await asyncio.get_running_loop().run_in_executor(_get_pool(), func, *args)
+
+
+async def make_password(raw_password):
+    """Hash ``raw_password`` in the hashing pool without blocking the event loop."""
+    return await _run(_make_password, raw_password)
+
+
+async def check_password(raw_password, encoded):
+    """
+    Check ``raw_password`` against ``encoded`` in the hashing pool.
+
+    Returns ``(matches, new_encoded)``; ``new_encoded`` is set when the stored
+    hash uses outdated parameters and should be saved in its place.
+    """
+    return await _run(_check_password, raw_password, encoded)
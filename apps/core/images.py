@@ -0,0 +1,188 @@
+import hashlib
+import io
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.db import connections, transaction
+
+from . import cache as response_cache
+
+logger = logging.getLogger(__name__)
+
+FORMATS = {'webp': 'WEBP', 'jpeg': 'JPEG'}
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    File storage whose names are derived from the file's SHA-256.
+
+    An existing file under the same name already holds the same bytes, so
+    saving it again is a no-op and duplicate uploads are written once.
+    """
+
+    def get_available_name(self, name, max_length=None):
+        return name
+
+    def _save(self, name, content):
+        if self.exists(name):
+            return name
+        return super()._save(name, content)
+
+
+content_addressed_storage = ContentAddressedStorage()
+
+
+def image_storage():
+    return content_addressed_storage
+
+
+def file_digest(file):
+    sha = hashlib.sha256()
+    for chunk in file.chunks():
+        sha.update(chunk)
+    file.seek(0)
+    return sha.hexdigest()
+
+
+def _content_path(prefix, file, filename):
+    digest = file_digest(file)
+    ext = os.path.splitext(filename)[1].lower()
+    return f'{prefix}/{digest[:2]}/{digest}{ext}'
+
+
+def post_image_path(instance, filename):
+    return _content_path('posts/images', instance.image, filename)
+
+
+def avatar_path(instance, filename):
+    return _content_path('profile_pics', instance.avatar, filename)
+
+
+def variant_name(digest, variant, fmt):
+    return f'variants/{digest[:2]}/{digest}/{variant}.{fmt}'
+
+
+def render_variants(data, sizes, formats, quality):
+    # Runs in a worker process: decode once, resize to every size, encode every format
+    from PIL import Image, ImageOps
+
+    rendered = {}
+    with Image.open(io.BytesIO(data)) as image:
+        image = ImageOps.exif_transpose(image)
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA' if 'transparency' in image.info else 'RGB')
+        for variant, max_edge in sizes.items():
+            resized = image.copy()
+            resized.thumbnail((max_edge, max_edge), Image.Resampling.LANCZOS)
+            for fmt in formats:
+                out = io.BytesIO()
+                frame = resized.convert('RGB') if fmt == 'jpeg' else resized
+                frame.save(out, FORMATS[fmt], quality=quality)
+                rendered[(variant, fmt)] = out.getvalue()
+    return rendered
+
+
+_process_pool = None
+_dispatcher = None
+_pool_lock = threading.Lock()
+
+
+def _pools():
+    global _process_pool, _dispatcher
+    with _pool_lock:
+        if _process_pool is None:
+            _process_pool = ProcessPoolExecutor(
+                max_workers=getattr(settings, 'IMAGE_PROCESS_WORKERS', 2),
+                mp_context=multiprocessing.get_context('spawn')
+            )
+            _dispatcher = ThreadPoolExecutor(max_workers=2, thread_name_prefix='image-pipeline')
+        return _process_pool, _dispatcher
+
+
+def variant_settings():
+    return (
+        getattr(settings, 'IMAGE_VARIANT_SIZES', {'thumb': 150, 'medium': 600}),
+        getattr(settings, 'IMAGE_VARIANT_FORMATS', ['webp', 'jpeg']),
+        getattr(settings, 'IMAGE_VARIANT_QUALITY', 82),
+    )
+
+
+def build_variants(model_label, pk, field_name, variants_field):
+    """
+    Render and store the variants of one image field and record them on the row.
+
+    Variants are stored under the original's content hash, so an image that
+    was already processed for another row is not decoded again.
+    """
+    model = apps.get_model(model_label)
+    instance = model._default_manager.filter(pk=pk).only(field_name).first()
+    if instance is None:
+        return
+    field_file = getattr(instance, field_name)
+    if not field_file:
+        return
+
+    sizes, formats, quality = variant_settings()
+    with field_file.open('rb') as source:
+        data = source.read()
+    digest = hashlib.sha256(data).hexdigest()
+    names = {(v, f): variant_name(digest, v, f) for v in sizes for f in formats}
+    storage = content_addressed_storage
+
+    if not all(storage.exists(name) for name in names.values()):
+        if getattr(settings, 'IMAGE_PIPELINE_ASYNC', True):
+            process_pool, _ = _pools()
+            rendered = process_pool.submit(render_variants, data, sizes, formats, quality).result()
+        else:
+            rendered = render_variants(data, sizes, formats, quality)
+        for key, content in rendered.items():
+            if not storage.exists(names[key]):
+                storage.save(names[key], ContentFile(content))
+
+    variants = {'source': field_file.name}
+    variants.update({f'{v}_{f}': name for (v, f), name in names.items()})
+    # Only record them if the image wasn't replaced while we were working
+    if model._default_manager.filter(pk=pk, **{field_name: field_file.name}).update(**{variants_field: variants}):
+        response_cache.bump(model, pk)
+
+
+def _run(func, *args):
+    try:
+        func(*args)
+    except Exception:
+        logger.exception('Image pipeline failed for %s', args)
+    finally:
+        connections.close_all()
+
+
+def schedule_variants(instance, field_name, variants_field):
+    field_file = getattr(instance, field_name)
+    variants = getattr(instance, variants_field) or {}
+    if not field_file or variants.get('source') == field_file.name:
+        return
+    args = (instance._meta.label, instance.pk, field_name, variants_field)
+    if getattr(settings, 'IMAGE_PIPELINE_ASYNC', True):
+        _, dispatcher = _pools()
+        transaction.on_commit(lambda: dispatcher.submit(_run, build_variants, *args))
+    else:
+        transaction.on_commit(lambda: build_variants(*args))
+
+
+def variant_urls(field_file, variants, request=None):
+    # Only the variants built from the image currently on the row
+    if not field_file or not variants or variants.get('source') != field_file.name:
+        return None
+    urls = {}
+    for key, name in variants.items():
+        if key == 'source':
+            continue
+        url = content_addressed_storage.url(name)
+        urls[key] = request.build_absolute_uri(url) if request else url
+    return urls
@@ -0,0 +1,62 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test import RequestFactory
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from apps.core.renderers import ORJSONRenderer
+from apps.posts.models import Post
+from apps.posts.serializers import PostListSerializer, post_list_rows
+from apps.users.models import User
+from apps.users.serializers import UserListSerializer, user_list_rows
+
+
+def _best(fn, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+class Command(BaseCommand):
+    help = (
+        'Time the post and user list payloads through the DRF serializers and through '
+        'the values_list() rows + orjson path, and check both produce the same bytes.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1000)
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        rows, repeat = options['rows'], options['repeat']
+        request = Request(RequestFactory().get('/', SERVER_NAME='localhost'))
+        context = {'request': request}
+        cases = [
+            ('posts', Post.objects.select_related('author').order_by('-created_at', '-pk'),
+             PostListSerializer, post_list_rows),
+            ('users', User.objects.select_related('stats').order_by('-date_joined', '-pk'),
+             UserListSerializer, user_list_rows),
+        ]
+
+        for name, queryset, serializer_class, row_serializer in cases:
+            def drf():
+                data = serializer_class(list(queryset[:rows]), many=True, context=context).data
+                return JSONRenderer().render(data)
+
+            def fast():
+                lookups, convert = row_serializer.compile(list(row_serializer.columns), context)
+                return ORJSONRenderer().render([convert(row) for row in queryset.values_list(*lookups)[:rows]])
+
+            drf_time, drf_body = _best(drf, repeat)
+            fast_time, fast_body = _best(fast, repeat)
+            if drf_body != fast_body:
+                raise CommandError(f'{name}: the two paths rendered different bytes')
+            count = len(queryset[:rows])
+            self.stdout.write(
+                f'{name}: {count} rows, {len(drf_body)} bytes | serializer {drf_time * 1000:.1f} ms, '
+                f'values rows {fast_time * 1000:.1f} ms ({drf_time / fast_time:.1f}x)'
+            )
@@ -0,0 +1,148 @@
+import re
+from collections import defaultdict
+from itertools import count
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import RequestFactory
+from django.utils import timezone
+from rest_framework.request import Request
+from apps.comments.models import Comment
+from apps.comments.views import CommentViewSet
+from apps.hashtags.views import HashtagViewSet
+from apps.posts import feed
+from apps.posts.models import Like
+from apps.posts.serializers import post_list_rows
+from apps.posts.views import PostViewSets
+from apps.users.graph import FOLLOWERS, FOLLOWING, related_ids
+from apps.users.models import User
+from apps.users.serializers import user_list_rows
+from apps.users.views import UserViewSet
+
+SCAN, SORT, LIST = 'full table scan', 'temp B-tree', 'materialized subquery'
+
+# An equality on a key column, e.g. '(from_user_id=?)' or '(rowid=?)'
+_KEYED = re.compile(r'[(\s](?:\w+_id|rowid)=\?')
+
+_explains = count()
+
+
+def explain(queryset):
+    sql, params = queryset.query.sql_with_params()
+    # sqlite3 reuses statements by their text and SQLite doesn't re-plan a reused EXPLAIN
+    # after the schema changes, so each one is made unique
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN QUERY PLAN {sql} /* {next(_explains)} */', params)
+        return [(node, parent, detail) for node, parent, _, detail in cursor.fetchall()]
+
+
+def problems(plan):
+    children = defaultdict(list)
+    for node, parent, detail in plan:
+        children[parent].append((node, detail))
+
+    def searches(node):
+        for child, detail in children[node]:
+            if detail.startswith('SEARCH '):
+                yield detail
+            yield from searches(child)
+
+    found = set()
+    for node, _, detail in plan:
+        # 'SCAN t USING INDEX i' walks an index in order; a bare 'SCAN t' reads the whole table
+        if detail.startswith('SCAN ') and ' USING ' not in detail and detail != 'SCAN CONSTANT ROW':
+            found.add(SCAN)
+        elif detail.startswith('USE TEMP B-TREE'):
+            found.add(SORT)
+        # An IN (subquery) is built in full before the outer query reads a row: fine when it is
+        # keyed by one id (the viewer's follows), not when it filters on a flag such as visibility
+        elif detail.startswith('LIST SUBQUERY') and not all(_KEYED.search(s) for s in searches(node)):
+            found.add(LIST)
+    return found
+
+
+def list_page(viewset, user, rows=None, cursor=None, **params):
+    # The page queries a list request runs: get_queryset(), filters, the row columns and keyset
+    # pagination, one query per branch for querysets the paginator pages branch by branch
+    request = Request(RequestFactory().get('/', params))
+    request.user = user
+    view = viewset(request=request, args=(), kwargs={}, format_kwarg=None, action='list')
+    queryset = view.filter_queryset(view.get_queryset())
+    if rows is not None:
+        lookups, _ = rows.compile_request(request, view.get_serializer_context(), view.paginator)
+        queryset = queryset.values_list(*lookups, named=True)
+    paginator = view.paginator
+    return paginator.page_querysets(queryset, cursor, paginator.get_page_size(request) + 1)
+
+
+def hot_queries():
+    """(name, queryset, {allowed problem: reason}) for the reads behind every list and feed."""
+    anonymous, user, admin = AnonymousUser(), User(pk=1), User(pk=1, is_staff=True)
+    now = timezone.now()
+    cursor, position = (now, 1, False), (now, 1)
+    queries = [
+        ('posts list, anonymous', list_page(PostViewSets, anonymous, post_list_rows), {}),
+        ('posts list, anonymous, next page', list_page(PostViewSets, anonymous, post_list_rows, cursor), {}),
+        ('posts list, anonymous, ?expand=author', list_page(PostViewSets, anonymous, expand='author'), {}),
+        ('posts list', list_page(PostViewSets, user, post_list_rows), {}),
+        ('posts list, next page', list_page(PostViewSets, user, post_list_rows, cursor), {}),
+        ('posts list, previous page', list_page(PostViewSets, user, post_list_rows, (now, 1, True)), {}),
+        ('posts list, ?author=', list_page(PostViewSets, user, post_list_rows, author=2), {}),
+        ('posts list, ?author=, next page', list_page(PostViewSets, user, post_list_rows, cursor, author=2), {}),
+        ('posts list, ?tag=', list_page(PostViewSets, anonymous, post_list_rows, tag='django'), {}),
+        ('liked post ids', Like.objects.filter(user=user, post_id__in=[1, 2, 3]).values_list('post_id', flat=True), {}),
+        ('home feed', feed.timeline_page(user), {}),
+        ('home feed, next page', feed.timeline_page(user, position), {}),
+        ('home feed, fan-in authors', feed.pulled_page([2, 3], position),
+         {SORT: 'merges the posts of several authors, only the followed fan-in ones'}),
+        ('comments list', list_page(CommentViewSet, user, post=1), {}),
+        ('comments list, next page', list_page(CommentViewSet, user, cursor=cursor, post=1), {}),
+        ('comment thread', Comment.objects.filter(post_id=1).select_related('author__stats').order_by('path'), {}),
+        ('users list', list_page(UserViewSet, admin, user_list_rows), {}),
+        ('users list, next page', list_page(UserViewSet, admin, user_list_rows, cursor), {}),
+        ('following ids', related_ids(FOLLOWING, 1), {}),
+        ('follower ids', related_ids(FOLLOWERS, 1), {}),
+        ('hashtags list', list_page(HashtagViewSet, anonymous), {}),
+    ]
+    # A paged list is one query per branch
+    for name, query, allowed in queries:
+        if not isinstance(query, list):
+            yield name, query, allowed
+        elif len(query) == 1:
+            yield name, query[0], allowed
+        else:
+            for i, branch in enumerate(query, 1):
+                yield f'{name}, branch {i}', branch, allowed
+
+
+class Command(BaseCommand):
+    help = (
+        'Run EXPLAIN QUERY PLAN on the hot list, feed and graph queries and fail if any of them '
+        'scans a whole table, sorts in a temp B-tree or builds an IN list that is not keyed by an id, '
+        'unless that query is known to need it.'
+    )
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError(f'Query plans are only checked on SQLite, not {connection.vendor}.')
+
+        failures = []
+        for name, queryset, allowed in hot_queries():
+            plan = explain(queryset)
+            found = problems(plan)
+            unexpected = sorted(found - set(allowed))
+            if unexpected:
+                failures.append(name)
+                self.stdout.write(self.style.ERROR(f'FAIL {name}: {", ".join(unexpected)}'))
+            elif found:
+                reasons = '; '.join(allowed[problem] for problem in sorted(found))
+                self.stdout.write(f'ok   {name} ({reasons})')
+            else:
+                self.stdout.write(f'ok   {name}')
+            if unexpected or options['verbosity'] > 1:
+                for _, _, detail in plan:
+                    self.stdout.write(f'       {detail}')
+
+        if failures:
+            raise CommandError(f'{len(failures)} queries lost their index: {", ".join(failures)}')
@@ -0,0 +1,232 @@
+import random
+from datetime import timedelta
+from itertools import accumulate
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import CharField, OuterRef, Subquery, Value
+from django.db.models.functions import Cast, Concat, LPad
+from django.utils import timezone
+from apps.comments.models import Comment, MAX_THREAD_DEPTH, PATH_SEGMENT_WIDTH
+from apps.hashtags.indexing import index_posts
+from apps.posts import feed
+from apps.posts.models import Post, Like
+from apps.users.graph import follow_graph
+from apps.users.models import User, Profile, Relationship, UserStats
+
+WORDS = (
+    'coffee morning build deploy weekend music travel photo city garden book movie run '
+    'coding python django database cache release review bug fix idea team launch night'
+).split()
+TAGS = (
+    'python django webdev music travel photography food running books movies coding '
+    'opensource design startup weekend coffee art gaming science news'
+).split()
+VISIBILITIES = ('public', 'followers', 'private')
+VISIBILITY_WEIGHTS = (0.75, 0.2, 0.05)
+BATCH_SIZE = 500
+
+
+def _heavy_tail(rng, mean, alpha, limit):
+    # Pareto draw rescaled to ``mean``: most values are small, a few are very large
+    return min(limit, int(rng.paretovariate(alpha) * mean * (alpha - 1) / alpha))
+
+
+def _weighted_sample(rng, population, cum_weights, k, exclude=()):
+    # Roughly k distinct picks, favouring heavy weights; over-draws to make up for duplicates
+    picks = dict.fromkeys(
+        value for value in rng.choices(population, cum_weights=cum_weights, k=k * 2)
+        if value not in exclude
+    )
+    return list(picks)[:k]
+
+
+def _audience(post, ids, followers):
+    # Who can see, and so like or comment on, a post
+    if post.visibility == 'public':
+        return ids
+    if post.visibility == 'followers':
+        return followers[post.author_id] + [post.author_id]
+    return [post.author_id]
+
+
+def _after(rng, moment, now):
+    return moment + (now - moment) * rng.random()
+
+
+def _bulk_create_backdated(model, rows):
+    # created_at is auto_now_add, so bulk_create stamps every row with the current time;
+    # the planned times are written back afterwards
+    planned = [row.created_at for row in rows]
+    model.objects.bulk_create(rows, batch_size=BATCH_SIZE)
+    for row, created_at in zip(rows, planned):
+        row.created_at = created_at
+    model.objects.bulk_update(rows, ['created_at'], batch_size=BATCH_SIZE)
+
+
+class Command(BaseCommand):
+    help = (
+        'Generate a reproducible social graph: users with power-law follower counts, posts '
+        'with hashtags, likes and nested comments, plus the counters and timelines they imply.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--avg-following', type=int, default=20)
+        parser.add_argument('--avg-posts', type=int, default=10)
+        parser.add_argument('--avg-likes', type=int, default=5)
+        parser.add_argument('--avg-comments', type=int, default=2)
+        parser.add_argument('--days', type=int, default=30)
+        parser.add_argument('--password', default='seed-password')
+        parser.add_argument('--prefix', default='seed')
+
+    def handle(self, *args, **options):
+        n, prefix = options['users'], options['prefix']
+        if n < 2:
+            raise CommandError('At least two users are needed.')
+        if User.objects.filter(username__startswith=f'{prefix}_').exists():
+            raise CommandError(f'Users named {prefix}_* already exist; use another --prefix or a fresh database.')
+
+        rng = random.Random(options['seed'])
+        now = timezone.now()
+        start = now - timedelta(days=options['days'])
+
+        with transaction.atomic():
+            users = self.create_users(rng, n, prefix, options['password'], start)
+            ids = [user.id for user in users]
+            followers = self.create_follows(rng, ids, options['avg_following'])
+            posts = self.create_posts(rng, ids, followers, options, start, now)
+            self.create_stats(ids, followers, posts)
+            index_posts(posts)
+
+        # Timelines are filled the way new posts are, in chunks so the id lists stay small
+        post_ids = [post.id for post in posts]
+        for i in range(0, len(post_ids), BATCH_SIZE):
+            feed.fan_out_posts(post_ids[i:i + BATCH_SIZE])
+        follow_graph.clear()
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Seeded {n} users, {sum(len(f) for f in followers.values())} follows, {len(posts)} posts, '
+            f'{sum(post.likes_count for post in posts)} likes and '
+            f'{sum(post.comments_count for post in posts)} comments.'
+        ))
+
+    def create_users(self, rng, n, prefix, password, start):
+        encoded = make_password(password)
+        users = User.objects.bulk_create([
+            User(
+                username=f'{prefix}_{i}',
+                email=f'{prefix}_{i}@example.com',
+                first_name=rng.choice(WORDS).title(),
+                last_name=f'{prefix.title()}{i}',
+                password=encoded,
+                date_joined=start + timedelta(seconds=i)
+            )
+            for i in range(n)
+        ], batch_size=BATCH_SIZE)
+        Profile.objects.bulk_create([
+            Profile(user=user, bio=' '.join(rng.choices(WORDS, k=8)))
+            for user in users if rng.random() < 0.5
+        ], batch_size=BATCH_SIZE)
+        return users
+
+    def create_follows(self, rng, ids, avg_following):
+        # Popularity follows a Zipf-like curve over a shuffled ranking, so follower counts are power-law
+        ranking = ids[:]
+        rng.shuffle(ranking)
+        cum_weights = list(accumulate(1 / (rank + 1) ** 1.1 for rank in range(len(ranking))))
+
+        followers = {user_id: [] for user_id in ids}
+        edges = []
+        for user_id in ids:
+            count = _heavy_tail(rng, avg_following, 1.8, len(ids) - 1)
+            for target in _weighted_sample(rng, ranking, cum_weights, count, exclude={user_id}):
+                followers[target].append(user_id)
+                edges.append(Relationship(from_user_id=user_id, to_user_id=target))
+        Relationship.objects.bulk_create(edges, batch_size=BATCH_SIZE)
+        return followers
+
+    def create_posts(self, rng, ids, followers, options, start, now):
+        span = (now - start).total_seconds()
+        posts = []
+        for author_id in ids:
+            for _ in range(_heavy_tail(rng, options['avg_posts'], 1.6, 50 * options['avg_posts'])):
+                words = rng.choices(WORDS, k=rng.randint(4, 20))
+                words += [f'#{tag}' for tag in rng.choices(TAGS, k=rng.choice((0, 0, 1, 1, 2)))]
+                posts.append(Post(
+                    author_id=author_id,
+                    content=' '.join(words),
+                    visibility=rng.choices(VISIBILITIES, VISIBILITY_WEIGHTS)[0],
+                    created_at=start + timedelta(seconds=rng.uniform(0, span))
+                ))
+
+        # Counters are set from the plan, so nothing has to be recounted afterwards
+        likes, comments = [], []
+        for post in posts:
+            audience = _audience(post, ids, followers)
+            post.likes_count = _heavy_tail(rng, options['avg_likes'], 1.5, len(audience))
+            for user_id in rng.sample(audience, post.likes_count):
+                likes.append(Like(user_id=user_id, post=post, created_at=_after(rng, post.created_at, now)))
+
+            post.comments_count = _heavy_tail(rng, options['avg_comments'], 1.5, 200)
+            thread = []
+            for _ in range(post.comments_count):
+                # Each comment answers an earlier one 40% of the time, as deep as Comment.clean allows
+                open_comments = [comment for comment in thread if comment.depth < MAX_THREAD_DEPTH]
+                parent = rng.choice(open_comments) if open_comments and rng.random() < 0.4 else None
+                comment = Comment(
+                    post=post,
+                    parent=parent,
+                    author_id=rng.choice(audience),
+                    content=' '.join(rng.choices(WORDS, k=rng.randint(3, 12))),
+                    depth=parent.depth + 1 if parent else 0,
+                    created_at=_after(rng, parent.created_at if parent else post.created_at, now)
+                )
+                thread.append(comment)
+                comments.append(comment)
+
+        _bulk_create_backdated(Post, posts)
+        for like in likes:
+            like.post_id = like.post.id
+        _bulk_create_backdated(Like, likes)
+        self.create_comments(comments)
+        return posts
+
+    def create_comments(self, comments):
+        # A level at a time, so replies can point at their parents' new ids
+        for depth in range(MAX_THREAD_DEPTH + 1):
+            level = [comment for comment in comments if comment.depth == depth]
+            for comment in level:
+                comment.post_id = comment.post.id
+                comment.parent_id = comment.parent.id if comment.parent else None
+            _bulk_create_backdated(Comment, level)
+
+            # Comment.save writes the path once the id exists; here one UPDATE does a whole level
+            segment = Concat(
+                LPad(Cast('id', CharField()), PATH_SEGMENT_WIDTH, Value('0')),
+                Value('/'),
+                output_field=CharField()
+            )
+            if depth:
+                parent_path = Comment.objects.filter(pk=OuterRef('parent_id')).values('path')
+                segment = Concat(Subquery(parent_path), segment, output_field=CharField())
+            Comment.objects.filter(depth=depth, path='').update(path=segment)
+
+    def create_stats(self, ids, followers, posts):
+        post_count, following_count = {}, {}
+        for post in posts:
+            post_count[post.author_id] = post_count.get(post.author_id, 0) + 1
+        for target, sources in followers.items():
+            for user_id in sources:
+                following_count[user_id] = following_count.get(user_id, 0) + 1
+        UserStats.objects.bulk_create([
+            UserStats(
+                user_id=user_id,
+                post_count=post_count.get(user_id, 0),
+                follower_count=len(followers[user_id]),
+                following_count=following_count.get(user_id, 0)
+            )
+            for user_id in ids
+        ], batch_size=BATCH_SIZE)
@@ -0,0 +1,225 @@
+import json
+import os
+import tempfile
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+
+from django.conf import settings
+
+# Process-local metrics, rendered in the Prometheus text format at /metrics.
+#
+# Every thread writes to its own shard, so recording takes no lock; a scrape
+# sums the shards. With METRICS_DIR set, each worker process also writes its
+# totals to METRICS_DIR/<pid>.json every METRICS_FLUSH_INTERVAL seconds and a
+# scrape adds up every file there, so any worker can answer for all of them.
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+COUNTER, HISTOGRAM = 'counter', 'histogram'
+
+METRICS = {
+    'http_request_duration_seconds': (HISTOGRAM, 'Request latency per view and action.'),
+    'http_responses_total': (COUNTER, 'Responses per view and status code.'),
+    'db_queries_total': (COUNTER, 'Database queries per view.'),
+    'cache_requests_total': (COUNTER, 'Cache lookups per cache and result (hit or miss).'),
+}
+
+
+def buckets():
+    return tuple(getattr(settings, 'METRICS_LATENCY_BUCKETS', DEFAULT_BUCKETS))
+
+
+class Registry:
+    def __init__(self):
+        self._local = threading.local()
+        self._shards = []
+        self._lock = threading.Lock()
+        self._flushed_at = time.monotonic()
+
+    def _shard(self):
+        shard = getattr(self._local, 'shard', None)
+        if shard is None:
+            shard = self._local.shard = ({}, {})
+            with self._lock:
+                self._shards.append(shard)
+        return shard
+
+    def inc(self, name, amount=1, **labels):
+        counters = self._shard()[0]
+        key = (name, tuple(sorted(labels.items())))
+        counters[key] = counters.get(key, 0) + amount
+
+    def observe(self, name, value, **labels):
+        histograms = self._shard()[1]
+        key = (name, tuple(sorted(labels.items())))
+        bounds = buckets()
+        histogram = histograms.get(key)
+        if histogram is None:
+            # One count per bucket, one for +Inf, then the sum
+            histogram = histograms[key] = [0] * (len(bounds) + 1) + [0.0]
+        histogram[bisect_left(bounds, value)] += 1
+        histogram[-1] += value
+
+    def snapshot(self):
+        counters, histograms = {}, {}
+        with self._lock:
+            shards = list(self._shards)
+        for shard_counters, shard_histograms in shards:
+            for key, value in list(shard_counters.items()):
+                counters[key] = counters.get(key, 0) + value
+            for key, values in list(shard_histograms.items()):
+                _add(histograms, key, values)
+        return counters, histograms
+
+    def reset(self):
+        with self._lock:
+            for counters, histograms in self._shards:
+                counters.clear()
+                histograms.clear()
+
+    def flush(self, force=False):
+        # Writes this process's totals for the other workers; a no-op without METRICS_DIR
+        directory = getattr(settings, 'METRICS_DIR', None)
+        if not directory:
+            return
+        now = time.monotonic()
+        if not force and now - self._flushed_at < getattr(settings, 'METRICS_FLUSH_INTERVAL', 5):
+            return
+        self._flushed_at = now
+        counters, histograms = self.snapshot()
+        payload = {
+            'counters': [[name, labels, value] for (name, labels), value in counters.items()],
+            'histograms': [[name, labels, values] for (name, labels), values in histograms.items()],
+        }
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        # Written aside and renamed, so a scrape never reads half a file
+        fd, tmp = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(payload, f)
+        os.replace(tmp, directory / f'{os.getpid()}.json')
+
+    def collect(self):
+        """Totals over every worker that has written to METRICS_DIR, or this process alone."""
+        directory = getattr(settings, 'METRICS_DIR', None)
+        if not directory:
+            return self.snapshot()
+        self.flush(force=True)
+        counters, histograms = {}, {}
+        for path in Path(directory).glob('*.json'):
+            try:
+                payload = json.loads(path.read_text())
+            except (OSError, ValueError):
+                continue
+            for name, labels, value in payload['counters']:
+                key = (name, tuple(map(tuple, labels)))
+                counters[key] = counters.get(key, 0) + value
+            for name, labels, values in payload['histograms']:
+                _add(histograms, (name, tuple(map(tuple, labels))), values)
+        return counters, histograms
+
+
+def _add(histograms, key, values):
+    total = histograms.get(key)
+    if total is None or len(total) != len(values):
+        histograms[key] = list(values)
+    else:
+        for i, value in enumerate(values):
+            total[i] += value
+
+
+registry = Registry()
+
+
+def inc(name, amount=1, **labels):
+    registry.inc(name, amount, **labels)
+
+
+def observe(name, value, **labels):
+    registry.observe(name, value, **labels)
+
+
+def cache_lookup(cache, hit):
+    registry.inc('cache_requests_total', cache=cache, result='hit' if hit else 'miss')
+
+
+# Queries are counted by a wrapper installed once on every connection. The counter lives in a
+# context variable, which sync_to_async carries into the thread where async views' ORM calls run.
+_query_counter = ContextVar('metrics_query_counter', default=None)
+
+
+def count_query(execute, sql, params, many, context):
+    counter = _query_counter.get()
+    if counter is not None:
+        counter[0] += 1
+    return execute(sql, params, many, context)
+
+
+def install_query_counter(sender, connection, **kwargs):
+    # connection_created receiver; fires again on every reconnect
+    if count_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(count_query)
+
+
+@contextmanager
+def counting_queries():
+    counter = [0]
+    token = _query_counter.set(counter)
+    try:
+        yield counter
+    finally:
+        _query_counter.reset(token)
+
+
+def _labels(labels, **extra):
+    pairs = list(labels) + list(extra.items())
+    if not pairs:
+        return ''
+    escaped = (
+        (name, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for name, value in pairs
+    )
+    return '{' + ','.join(f'{name}="{value}"' for name, value in escaped) + '}'
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render(counters, histograms):
+    """Prometheus text exposition (version 0.0.4)."""
+    lines = []
+    bounds = buckets()
+    for name, (kind, help_text) in METRICS.items():
+        lines += [f'# HELP {name} {help_text}', f'# TYPE {name} {kind}']
+        if kind == COUNTER:
+            for (metric, labels), value in sorted(counters.items()):
+                if metric == name:
+                    lines.append(f'{name}{_labels(labels)} {_number(value)}')
+            continue
+        for (metric, labels), values in sorted(histograms.items()):
+            if metric != name:
+                continue
+            cumulative = 0
+            for bound, count in zip((*bounds, '+Inf'), values[:-1]):
+                cumulative += count
+                le = bound if bound == '+Inf' else _number(float(bound))
+                lines.append(f'{name}_bucket{_labels(labels, le=le)} {cumulative}')
+            lines.append(f'{name}_sum{_labels(labels)} {_number(values[-1])}')
+            lines.append(f'{name}_count{_labels(labels)} {cumulative}')
+
+    # Hit ratios are derived from the summed counters, so they are right across workers too
+    lookups = {}
+    for (metric, labels), value in counters.items():
+        if metric == 'cache_requests_total':
+            fields = dict(labels)
+            hits, total = lookups.get(fields['cache'], (0, 0))
+            lookups[fields['cache']] = (hits + (value if fields['result'] == 'hit' else 0), total + value)
+    lines += ['# HELP cache_hit_ratio Share of cache lookups that hit.', '# TYPE cache_hit_ratio gauge']
+    for cache, (hits, total) in sorted(lookups.items()):
+        lines.append(f'cache_hit_ratio{_labels((("cache", cache),))} {_number(hits / total)}')
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,223 @@
+import json
+import logging
+import re
+import sys
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from rest_framework.fields import Field
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+APPS_DIR = str(Path(__file__).resolve().parent.parent)
+# Our own query wrappers are never the call site
+_WRAPPER_FILES = {__file__, metrics.__file__}
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+_IN_LIST = re.compile(r'\bIN \((?:\s*%s\s*,)*\s*%s\s*\)', re.IGNORECASE)
+_SPACE = re.compile(r'\s+')
+
+
+def fingerprint(sql):
+    # Literals and IN lists collapsed, so the same query for another row has the same fingerprint
+    sql = _STRING.sub('%s', sql)
+    sql = _NUMBER.sub('%s', sql)
+    sql = _IN_LIST.sub('IN (...)', sql)
+    return _SPACE.sub(' ', sql).strip()
+
+
+def _call_site():
+    # Innermost frame in our own code (e.g. a serializer method), or the serializer field
+    # being rendered when the query comes from a lazy relation that DRF follows
+    frame = sys._getframe(2)
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if filename.startswith(APPS_DIR) and filename not in _WRAPPER_FILES:
+            return f'{Path(filename).relative_to(APPS_DIR)}:{frame.f_lineno} in {frame.f_code.co_name}'
+        field = frame.f_locals.get('self')
+        if isinstance(field, Field) and getattr(field, 'parent', None) is not None:
+            return f'{type(field.parent).__name__}.{field.field_name}'
+        frame = frame.f_back
+    return None
+
+
+# As with metrics.count_query: one wrapper on every connection (connection_created, see
+# apps.py) reports to the recorder in a context variable, which sync_to_async carries into
+# the thread where async views' ORM calls run
+_recorder = ContextVar('sql_instrumentation_recorder', default=None)
+
+
+def record_query(execute, sql, params, many, context):
+    recorder = _recorder.get()
+    if recorder is None:
+        return execute(sql, params, many, context)
+    return recorder(execute, sql, params, many, context)
+
+
+def install_query_recorder(sender, connection, **kwargs):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+@contextmanager
+def recording(recorder):
+    token = _recorder.set(recorder)
+    try:
+        yield recorder
+    finally:
+        _recorder.reset(token)
+
+
+class QueryRecorder:
+    """
+    ``connection.execute_wrapper`` that counts and times queries by fingerprint.
+
+    When a fingerprint reaches ``threshold`` executions, the call site of
+    that execution is kept: a query repeated once per row comes from the
+    line that loops.
+    """
+
+    def __init__(self, threshold):
+        self.threshold = threshold
+        self.count = 0
+        self.duration = 0.0
+        self.fingerprints = {}
+        self.sites = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - start
+            self.count += 1
+            self.duration += elapsed
+            key = fingerprint(sql)
+            seen = self.fingerprints.get(key, 0) + 1
+            self.fingerprints[key] = seen
+            if seen == self.threshold:
+                self.sites[key] = _call_site()
+
+    def suspects(self):
+        return [
+            {'fingerprint': key, 'count': self.fingerprints[key], 'site': site}
+            for key, site in self.sites.items()
+        ]
+
+
+class QueryInstrumentationMiddleware:
+    """
+    Per-request SQL numbers, enabled with ``SQL_INSTRUMENTATION``.
+
+    Adds a ``Server-Timing`` entry with the query count and total SQL time,
+    logs one JSON line per request to ``apps.core.middleware``, and logs a
+    warning for every fingerprint run ``SQL_N_PLUS_ONE_THRESHOLD`` times or
+    more (a suspected N+1). Queries made while a streaming response is sent
+    happen after the response leaves here, so they are not counted.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'SQL_INSTRUMENTATION', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.threshold = getattr(settings, 'SQL_N_PLUS_ONE_THRESHOLD', 5)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        start = time.perf_counter()
+        with recording(QueryRecorder(self.threshold)) as recorder:
+            response = self.get_response(request)
+        return self.report(request, response, recorder, time.perf_counter() - start)
+
+    async def __acall__(self, request):
+        start = time.perf_counter()
+        with recording(QueryRecorder(self.threshold)) as recorder:
+            response = await self.get_response(request)
+        return self.report(request, response, recorder, time.perf_counter() - start)
+
+    def report(self, request, response, recorder, total):
+        suspects = recorder.suspects()
+        timing = f'db;dur={recorder.duration * 1000:.1f};desc="{recorder.count} queries"'
+        if suspects:
+            timing += f', db-repeat;desc="{len(suspects)} repeated"'
+        response['Server-Timing'] = ', '.join(filter(None, [response.get('Server-Timing'), timing]))
+
+        logger.info(json.dumps({
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'queries': recorder.count,
+            'sql_ms': round(recorder.duration * 1000, 2),
+            'total_ms': round(total * 1000, 2),
+            'fingerprints': len(recorder.fingerprints),
+        }))
+        for suspect in suspects:
+            logger.warning(json.dumps({'path': request.path, 'suspected_n_plus_one': suspect}))
+        return response
+
+
+def view_name(request):
+    # 'PostViewSets.like' for viewset actions, the dotted function path for plain views
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unmatched'
+    func = match.func
+    cls = getattr(func, 'cls', None)
+    if cls is None:
+        return f'{func.__module__}.{func.__name__}'
+    action = (getattr(func, 'actions', None) or {}).get(request.method.lower())
+    return f'{cls.__name__}.{action}' if action else cls.__name__
+
+
+class MetricsMiddleware:
+    """
+    Latency, status and query counts per view for apps.core.metrics.
+
+    Sync and async capable, so the async views aren't moved to a thread
+    just to be measured.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'METRICS_ENABLED', True):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        start = time.perf_counter()
+        with metrics.counting_queries() as queries:
+            response = self.get_response(request)
+        self.record(request, response, time.perf_counter() - start, queries[0])
+        return response
+
+    async def __acall__(self, request):
+        start = time.perf_counter()
+        with metrics.counting_queries() as queries:
+            response = await self.get_response(request)
+        self.record(request, response, time.perf_counter() - start, queries[0])
+        return response
+
+    def record(self, request, response, elapsed, queries):
+        view = view_name(request)
+        metrics.observe('http_request_duration_seconds', elapsed, view=view, method=request.method)
+        metrics.inc('http_responses_total', view=view, status=response.status_code)
+        if queries:
+            metrics.inc('db_queries_total', queries, view=view)
+        metrics.registry.flush()
@@ -0,0 +1,167 @@
+import heapq
+from base64 import b64decode, b64encode
+from collections import OrderedDict
+from itertools import islice
+from urllib import parse
+
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetCursorPagination(BasePagination):
+    """
+    Cursor pagination over ``(ordering_field, id)``, newest first.
+
+    Each page is a range scan starting right after the last row of the
+    previous one, so deep pages cost the same as the first page.
+
+    A queryset with a ``keyset_branches()`` method (see
+    ``PostQuerySet.visible_to``) is paged one branch at a time, each
+    branch a limited range scan on its own index, and the branch pages
+    are merged; an OR across the branches would sort every matching row.
+    """
+    ordering_field = 'created_at'
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Invalid cursor'
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+    def get_page_size(self, request):
+        page_size = api_settings.PAGE_SIZE or 20
+        value = request.query_params.get(self.page_size_query_param)
+        if value:
+            try:
+                page_size = int(value)
+            except ValueError:
+                pass
+        return max(1, min(page_size, self.max_page_size))
+
+    def decode_cursor(self, request, model):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+        try:
+            tokens = parse.parse_qs(b64decode(encoded.encode('ascii')).decode('ascii'), keep_blank_values=True)
+            field = model._meta.get_field(self.ordering_field)
+            value = field.to_python(tokens['p'][0])
+            pk = int(tokens['i'][0])
+            reverse = bool(int(tokens.get('r', ['0'])[0]))
+        except (TypeError, ValueError, KeyError, UnicodeError):
+            raise NotFound(self.invalid_cursor_message)
+        if value is None:
+            raise NotFound(self.invalid_cursor_message)
+        return value, pk, reverse
+
+    def encode_cursor(self, instance, reverse=False):
+        value = getattr(instance, self.ordering_field)
+        tokens = {'p': value.isoformat() if hasattr(value, 'isoformat') else str(value), 'i': str(instance.pk)}
+        if reverse:
+            tokens['r'] = '1'
+        encoded = b64encode(parse.urlencode(tokens).encode('ascii')).decode('ascii')
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    def filter_queryset(self, queryset, cursor):
+        field = self.ordering_field
+        if cursor is None:
+            return queryset.order_by(f'-{field}', '-pk')
+        value, pk, reverse = cursor
+        if reverse:
+            # Walking back towards newer rows
+            return (
+                queryset.filter(**{f'{field}__gte': value})
+                .exclude(**{field: value, 'pk__lte': pk})
+                .order_by(field, 'pk')
+            )
+        return (
+            queryset.filter(**{f'{field}__lte': value})
+            .exclude(**{field: value, 'pk__gte': pk})
+            .order_by(f'-{field}', '-pk')
+        )
+
+    def page_querysets(self, queryset, cursor, limit):
+        """One limited queryset per branch of ``queryset``; their merge is the page."""
+        branches = queryset.keyset_branches() if hasattr(queryset, 'keyset_branches') else None
+        return [self.filter_queryset(branch, cursor)[:limit] for branch in branches or [queryset]]
+
+    def merge(self, pages, limit):
+        if len(pages) == 1:
+            return pages[0]
+        field = self.ordering_field
+        newest_first = not (self.cursor is not None and self.cursor[2])
+        rows = heapq.merge(*pages, key=lambda row: (getattr(row, field), row.pk), reverse=newest_first)
+        return list(islice(rows, limit))
+
+    def _page_querysets(self, queryset, request):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        self.cursor = self.decode_cursor(request, queryset.model)
+        return self.page_querysets(queryset, self.cursor, self.page_size + 1)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        pages = [list(page) for page in self._page_querysets(queryset, request)]
+        return self.build_page(self.merge(pages, self.page_size + 1))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        # Same page through the async ORM
+        pages = [[row async for row in page] for page in self._page_querysets(queryset, request)]
+        return self.build_page(self.merge(pages, self.page_size + 1))
+
+    def build_page(self, rows):
+        # rows holds up to page_size + 1 items; the extra one only tells us if there is more
+        has_more = len(rows) > self.page_size
+        page = rows[:self.page_size]
+        reverse = self.cursor is not None and self.cursor[2]
+        if reverse:
+            page.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, self.cursor is not None
+        self.page = page
+        return page
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        if not self.page:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(self.page[-1])
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def get_paginated_data(self, data):
+        return OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ])
+
+    def get_paginated_response(self, data):
+        return Response(self.get_paginated_data(data))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+
+class CreatedAtCursorPagination(KeysetCursorPagination):
+    ordering_field = 'created_at'
+
+
+class DateJoinedCursorPagination(KeysetCursorPagination):
+    ordering_field = 'date_joined'
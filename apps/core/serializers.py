@@ -0,0 +1,52 @@
+from django.utils.module_loading import import_string
+from rest_framework.permissions import SAFE_METHODS
+
+
+def requested_fields(params, param='fields'):
+    # Names listed in ?fields= / ?expand=, or None when the client didn't ask for a subset
+    value = params.get(param) if params is not None else None
+    if not value:
+        return None
+    return {name.strip() for name in value.split(',') if name.strip()}
+
+
+def wants(params, *names):
+    # Whether any of ``names`` will be rendered: used to skip joins, annotations and lookups
+    fields = requested_fields(params)
+    expand = requested_fields(params, 'expand') or set()
+    return fields is None or any(name in fields or name in expand for name in names)
+
+
+def expands(params, name):
+    return name in (requested_fields(params, 'expand') or ())
+
+
+class SparseFieldsMixin:
+    """
+    ``?fields=`` and ``?expand=`` for serializers rendered at the top level.
+
+    ``?fields=id,content`` keeps only the listed fields, so method fields and
+    nested serializers that weren't asked for are never evaluated.
+    ``?expand=name`` swaps in the serializer declared for ``name`` in
+    ``Meta.expandable_fields`` (dotted path and kwargs). Expanded fields are
+    always rendered. Only safe methods are affected, so writes always see
+    every field.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get('request')
+        if request is None or request.method not in SAFE_METHODS:
+            return
+        params = request.query_params
+
+        expandable = getattr(self.Meta, 'expandable_fields', {})
+        expand = (requested_fields(params, 'expand') or set()) & expandable.keys()
+        for name in expand:
+            path, field_kwargs = expandable[name]
+            self.fields[name] = import_string(path)(read_only=True, **field_kwargs)
+
+        fields = requested_fields(params)
+        if fields is not None:
+            for name in set(self.fields) - fields - expand:
+                self.fields.pop(name)
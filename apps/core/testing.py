@@ -0,0 +1,61 @@
+from io import StringIO
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.management import call_command
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APITestCase
+from apps.core.authentication import user_cache
+from apps.users.graph import follow_graph
+
+
+@override_settings(FEED_FANOUT_ASYNC=False, IMAGE_PIPELINE_ASYNC=False, LIKE_BUFFER_ENABLED=False)
+class SeededAPITestCase(APITestCase):
+    """
+    API tests against a seed_social_graph dataset, with helpers that put an
+    upper bound on the queries a request makes.
+
+    Query budgets are per request and must not depend on how many rows come
+    back: ``assertQueriesConstant`` fails when a bigger page costs more.
+    """
+    seed_options = {'users': 60, 'seed': 7}
+
+    @classmethod
+    def setUpTestData(cls):
+        call_command('seed_social_graph', stdout=StringIO(), **cls.seed_options)
+
+    def setUp(self):
+        # Process-local caches outlive the per-test transaction rollback
+        caches[settings.RESPONSE_CACHE_ALIAS].clear()
+        user_cache.clear()
+        follow_graph.clear()
+
+    def request(self, method, url, user=None, **kwargs):
+        self.client.force_authenticate(user)
+        with CaptureQueriesContext(connection) as queries:
+            response = getattr(self.client, method)(url, **kwargs)
+        return response, queries
+
+    def assertMaxQueries(self, limit, url, user=None, method='get', status=200, **kwargs):
+        response, queries = self.request(method, url, user, **kwargs)
+        self.assertEqual(response.status_code, status, response.content)
+        self.assertLessEqual(
+            len(queries), limit,
+            f'{method.upper()} {url}: {len(queries)} queries, budget {limit}\n'
+            + '\n'.join(query['sql'] for query in queries)
+        )
+        return response
+
+    def assertQueriesConstant(self, url, user=None, sizes=(5, 50), param='page_size'):
+        # Same query count for a small and a large page, and the large page has to be larger
+        counts, lengths = [], []
+        separator = '&' if '?' in url else '?'
+        for size in sizes:
+            response, queries = self.request('get', f'{url}{separator}{param}={size}', user)
+            self.assertEqual(response.status_code, 200, response.content)
+            counts.append(len(queries))
+            lengths.append(len(response.json()['results']))
+        self.assertLess(lengths[0], lengths[1], f'{url}: the dataset is too small to compare page sizes')
+        self.assertEqual(counts[0], counts[1], f'{url}: queries grow with the page size ({counts} for {lengths} rows)')
@@ -0,0 +1,183 @@
+import json
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from io import BytesIO, StringIO
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.core.cache import caches
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import AsyncClient, TestCase, override_settings
+from django.utils import timezone
+from PIL import Image
+from rest_framework.test import APIClient
+from apps.comments.models import Comment
+from apps.posts.models import Like, Post
+from apps.users.models import User
+from . import metrics
+from .management.commands.check_query_plans import LIST, explain, problems
+from .middleware import QueryInstrumentationMiddleware, QueryRecorder, fingerprint
+
+
+class QueryInstrumentationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='alice', email='alice@example.com', password='seed-password')
+        Post.objects.bulk_create([Post(author=cls.user, content=f'post {i}') for i in range(6)])
+
+    def test_fingerprint_ignores_literals(self):
+        self.assertEqual(
+            fingerprint("SELECT * FROM t WHERE id = 12 AND name = 'x'  AND pk IN (%s, %s, %s)"),
+            fingerprint("SELECT * FROM t WHERE id = 7 AND name = 'y' AND pk IN (%s)")
+        )
+
+    def test_repeated_query_is_reported_with_its_call_site(self):
+        recorder = QueryRecorder(threshold=5)
+        with connection.execute_wrapper(recorder):
+            for post in Post.objects.all():
+                Post.objects.filter(pk=post.pk).exists()
+        self.assertEqual(recorder.count, 7)
+        [suspect] = recorder.suspects()
+        self.assertEqual(suspect['count'], 6)
+        self.assertIn('core/tests.py', suspect['site'])
+
+    @override_settings(SQL_INSTRUMENTATION=True)
+    def test_middleware_reports_queries(self):
+        with self.assertLogs('apps.core.middleware', 'INFO') as logs:
+            response = APIClient().get('/api/posts/posts/')
+        self.assertRegex(response['Server-Timing'], r'^db;dur=[\d.]+;desc="1 queries"$')
+        line = json.loads(logs.records[0].getMessage())
+        self.assertEqual((line['path'], line['status'], line['queries']), ('/api/posts/posts/', 200, 1))
+
+    @override_settings(SQL_INSTRUMENTATION=True)
+    async def test_middleware_reports_async_view_queries(self):
+        async def get_response(request):
+            pass
+
+        # An async view stays on the event loop instead of being wrapped for a sync middleware
+        self.assertTrue(iscoroutinefunction(QueryInstrumentationMiddleware(get_response)))
+        with self.assertLogs('apps.core.middleware', 'INFO') as logs:
+            response = await AsyncClient().get('/api/posts/async/posts/')
+        self.assertEqual(response.status_code, 200)
+        self.assertRegex(response['Server-Timing'], r'^db;dur=[\d.]+;desc="1 queries"$')
+        self.assertEqual(json.loads(logs.records[0].getMessage())['queries'], 1)
+
+
+class MetricsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='alice', email='alice@example.com', password='seed-password')
+        cls.post = Post.objects.create(author=cls.user, content='post', visibility='public')
+
+    def setUp(self):
+        metrics.registry.reset()
+        caches[settings.RESPONSE_CACHE_ALIAS].clear()
+
+    def test_metrics_endpoint(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        client.post(f'/api/posts/posts/{self.post.id}/like/')
+        client.get('/api/posts/async/posts/')
+        body = client.get('/metrics').content.decode()
+
+        self.assertIn('# TYPE http_request_duration_seconds histogram', body)
+        self.assertIn('http_request_duration_seconds_count{method="POST",view="PostViewSets.like"} 1', body)
+        self.assertIn('http_responses_total{status="201",view="PostViewSets.like"} 1', body)
+        self.assertIn('db_queries_total{view="apps.posts.async_views.post_list"} 3', body)
+
+    def test_cache_hit_ratio(self):
+        for _ in range(4):
+            APIClient().get(f'/api/posts/posts/{self.post.id}/')
+        body = APIClient().get('/metrics').content.decode()
+        self.assertIn('cache_hit_ratio{cache="response"} 0.75', body)
+
+
+class SeedTests(TestCase):
+    def test_rows_keep_their_planned_times(self):
+        start = timezone.now()
+        call_command('seed_social_graph', users=20, seed=3, days=10, stdout=StringIO())
+        for model in (Post, Like, Comment):
+            # auto_now_add stays on, and the seeded rows are spread over the ten days
+            self.assertTrue(model._meta.get_field('created_at').auto_now_add)
+            oldest = model.objects.order_by('created_at').values_list('created_at', flat=True).first()
+            self.assertLess(oldest, start - timedelta(days=1), model.__name__)
+
+
+@override_settings(IMAGE_PIPELINE_ASYNC=False)
+class ImageUploadTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='alice', email='alice@example.com', password='seed-password')
+
+    def setUp(self):
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media)
+        self.enterContext(override_settings(MEDIA_ROOT=media))
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def upload(self, content, name='photo.png'):
+        image = SimpleUploadedFile(name, content)
+        return self.client.post('/api/posts/posts/', {'content': 'photo #python', 'image': image}, format='multipart')
+
+    def png(self, size=(40, 30), noise=False):
+        image = Image.frombytes('RGB', size, os.urandom(size[0] * size[1] * 3)) if noise else Image.new('RGB', size)
+        buffer = BytesIO()
+        image.save(buffer, 'PNG')
+        return buffer.getvalue()
+
+    def test_valid_image_is_accepted(self):
+        response = self.upload(self.png())
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertTrue(Post.objects.get(pk=response.json()['id']).image)
+
+    def test_rejections(self):
+        cases = [
+            ('not an image', b'just some text, not an image ' * 100, 'not a valid image'),
+            ('too wide', self.png(size=(8001, 1)), 'at most 8000x8000 pixels'),
+        ]
+        for label, content, reason in cases:
+            with self.subTest(label):
+                response = self.upload(content)
+                self.assertEqual(response.status_code, 400)
+                self.assertIn(reason, response.json()['detail'])
+        self.assertFalse(Post.objects.exists())
+
+    @override_settings(IMAGE_UPLOAD_MAX_BYTES={'image': 4096})
+    def test_byte_cap(self):
+        content = self.png(size=(100, 100), noise=True)
+        self.assertGreater(len(content), 4096)
+        response = self.upload(content)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('at most 4096 bytes', response.json()['detail'])
+        self.assertFalse(Post.objects.exists())
+
+
+class QueryPlanTests(TestCase):
+    def test_unkeyed_in_list_is_reported(self):
+        # Every visible post id listed up front, as the comment list used to do
+        user = User(pk=1)
+        queryset = Comment.objects.filter(post__in=Post.objects.visible_to(user).values('id'), post_id=1)
+        self.assertIn(LIST, problems(explain(queryset)))
+        self.assertEqual(problems(explain(Post.objects.visible_to(user).filter(author_id=2)[:5])), set())
+
+    def test_hot_queries_use_indexes(self):
+        out = StringIO()
+        call_command('check_query_plans', stdout=out)
+        self.assertNotIn('FAIL', out.getvalue())
+
+    def test_missing_index_fails(self):
+        with connection.cursor() as cursor:
+            cursor.execute('DROP INDEX users_user_date_jo_158b6d_idx')
+            cursor.execute('DROP INDEX posts_post_author__85d846_idx')
+        out = StringIO()
+        with self.assertRaisesMessage(CommandError, 'users list'):
+            call_command('check_query_plans', stdout=out)
+        self.assertIn('FAIL users list: temp B-tree', out.getvalue())
+        self.assertIn('FAIL users list, next page: full table scan, temp B-tree', out.getvalue())
+        # The reader's own posts, ordered by the author index
+        self.assertIn('FAIL posts list, next page, branch 2: temp B-tree', out.getvalue())
@@ -0,0 +1,78 @@
+import io
+
+from django.conf import settings
+from django.core.files.uploadhandler import FileUploadHandler
+from django.http.multipartparser import MultiPartParserError
+from PIL import Image, UnidentifiedImageError
+
+# How much of the file we are willing to hold while waiting for a parseable header
+HEADER_BYTES = 256 * 1024
+
+
+class ImageUploadRejected(MultiPartParserError):
+    # DRF's MultiPartParser turns MultiPartParserError into a 400 ParseError
+    pass
+
+
+class ImageUploadHandler(FileUploadHandler):
+    """
+    Validates image uploads while they stream in.
+
+    Sits in front of Django's memory/temporary-file handlers and passes every
+    chunk through. For the fields listed in ``IMAGE_UPLOAD_MAX_BYTES`` it
+    stops the upload as soon as the byte cap is crossed, and once enough
+    bytes have arrived it opens the header lazily with Pillow (no pixel data
+    is decoded) to check the format and dimensions. A bad upload is rejected
+    after at most one header's worth of data instead of after the whole file
+    has been spooled.
+    """
+
+    def new_file(self, field_name, *args, **kwargs):
+        super().new_file(field_name, *args, **kwargs)
+        limits = getattr(settings, 'IMAGE_UPLOAD_MAX_BYTES', {})
+        self.max_bytes = limits.get(field_name)
+        self.received = 0
+        self.header = bytearray()
+        self.verified = False
+        if self.max_bytes and self.content_length and self.content_length > self.max_bytes:
+            self._reject(f'must be at most {self.max_bytes} bytes')
+
+    def _reject(self, reason):
+        raise ImageUploadRejected(f'Upload "{self.field_name}" rejected: {reason}.')
+
+    def _inspect(self, complete=False):
+        try:
+            with Image.open(io.BytesIO(self.header)) as image:
+                image_format, (width, height) = image.format, image.size
+        except Image.DecompressionBombError:
+            self._reject('image dimensions are too large')
+        except (UnidentifiedImageError, OSError, SyntaxError, ValueError):
+            if complete or len(self.header) >= HEADER_BYTES:
+                self._reject('not a valid image')
+            return
+
+        formats = getattr(settings, 'IMAGE_UPLOAD_FORMATS', ['JPEG', 'PNG', 'WEBP', 'GIF'])
+        if image_format not in formats:
+            self._reject(f'{image_format} images are not accepted')
+        max_dimension = getattr(settings, 'IMAGE_UPLOAD_MAX_DIMENSION', 8000)
+        if width > max_dimension or height > max_dimension:
+            self._reject(f'image must be at most {max_dimension}x{max_dimension} pixels')
+        self.verified = True
+        self.header = None
+
+    def receive_data_chunk(self, raw_data, start):
+        if not self.max_bytes:
+            return raw_data
+        self.received += len(raw_data)
+        if self.received > self.max_bytes:
+            self._reject(f'must be at most {self.max_bytes} bytes')
+        if not self.verified:
+            self.header += raw_data[:HEADER_BYTES - len(self.header)]
+            self._inspect()
+        return raw_data
+
+    def file_complete(self, file_size):
+        if self.max_bytes and not self.verified:
+            self._inspect(complete=True)
+        # Let the next handler build the uploaded file
+        return None
@@ -0,0 +1,10 @@
+from django.http import HttpResponse
+from . import metrics
+
+
+def metrics_view(request):
+    # Prometheus scrape endpoint
+    return HttpResponse(
+        metrics.render(*metrics.registry.collect()),
+        content_type='text/plain; version=0.0.4; charset=utf-8'
+    )
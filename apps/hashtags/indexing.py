@@ -0,0 +1,137 @@
+import re
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import F, Sum
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from .models import Hashtag, PostHashtag, HashtagBucket
+
+HASHTAG_RE = re.compile(r'#(\w{1,64})')
+
+
+def extract_hashtags(content):
+    names = []
+    for match in HASHTAG_RE.finditer(content or ''):
+        name = match.group(1).lower()
+        if name not in names:
+            names.append(name)
+    return names
+
+
+def normalize_tag(value):
+    return value.strip().lstrip('#').lower()
+
+
+def bucket_seconds():
+    return getattr(settings, 'HASHTAG_BUCKET_SECONDS', 3600)
+
+
+def bucket_start(moment):
+    size = bucket_seconds()
+    return moment - timedelta(seconds=moment.timestamp() % size)
+
+
+def _hashtag_ids(names):
+    Hashtag.objects.bulk_create([Hashtag(name=name) for name in names], ignore_conflicts=True)
+    return dict(Hashtag.objects.filter(name__in=names).values_list('name', 'id'))
+
+
+def _count_uses(uses):
+    # uses: {(bucket, hashtag_id): n}; a negative n takes uses back, never below zero
+    HashtagBucket.objects.bulk_create(
+        [HashtagBucket(hashtag_id=tag_id, bucket=bucket) for (bucket, tag_id), n in uses.items() if n > 0],
+        ignore_conflicts=True
+    )
+    by_amount = {}
+    for (bucket, tag_id), n in uses.items():
+        if n:
+            by_amount.setdefault((bucket, n), []).append(tag_id)
+    for (bucket, n), tag_ids in by_amount.items():
+        HashtagBucket.objects.filter(bucket=bucket, hashtag_id__in=tag_ids).update(
+            count=Greatest(F('count') + n, 0)
+        )
+
+
+def _add_uses(uses, post, tag_ids, n):
+    # A post's uses are counted in the bucket it was created in, so they can be taken back exactly
+    bucket = bucket_start(post.created_at)
+    for tag_id in tag_ids:
+        uses[bucket, tag_id] = uses.get((bucket, tag_id), 0) + n
+
+
+def index_posts(posts):
+    # Links freshly created posts to their hashtags in a fixed number of queries
+    links = {post.id: extract_hashtags(post.content) for post in posts}
+    names = {name for tags in links.values() for name in tags}
+    if not names:
+        return
+    ids = _hashtag_ids(names)
+    PostHashtag.objects.bulk_create(
+        [
+            PostHashtag(post_id=post.id, hashtag_id=ids[name], created_at=post.created_at)
+            for post in posts for name in links[post.id]
+        ],
+        ignore_conflicts=True
+    )
+    # Trending is public, so only public posts feed it
+    uses = {}
+    for post in posts:
+        if post.visibility == 'public':
+            _add_uses(uses, post, [ids[name] for name in links[post.id]], 1)
+    if uses:
+        _count_uses(uses)
+
+
+def reindex_post(post, old_visibility=None):
+    """
+    Bring a saved post's hashtag links and trending counts up to date.
+
+    ``old_visibility`` is the visibility the post was last counted under
+    (the current one when not given); a post counts only while public.
+    """
+    names = set(extract_hashtags(post.content))
+    current = dict(
+        PostHashtag.objects.filter(post=post).values_list('hashtag__name', 'hashtag_id')
+    )
+    removed = [tag_id for name, tag_id in current.items() if name not in names]
+    added = names - current.keys()
+    if removed:
+        PostHashtag.objects.filter(post=post, hashtag_id__in=removed).delete()
+    ids = {}
+    if added:
+        ids = _hashtag_ids(added)
+        PostHashtag.objects.bulk_create(
+            [PostHashtag(post=post, hashtag_id=ids[name], created_at=post.created_at) for name in added],
+            ignore_conflicts=True
+        )
+
+    was_counted = set(current.values()) if (old_visibility or post.visibility) == 'public' else set()
+    counted = {*current.values(), *ids.values()} - set(removed) if post.visibility == 'public' else set()
+    uses = {}
+    _add_uses(uses, post, counted - was_counted, 1)
+    _add_uses(uses, post, was_counted - counted, -1)
+    if uses:
+        _count_uses(uses)
+
+
+def unindex_post(post):
+    # The post is being deleted: take back its trending uses before its links cascade away
+    if post.visibility == 'public':
+        tag_ids = PostHashtag.objects.filter(post=post).values_list('hashtag_id', flat=True)
+        uses = {}
+        _add_uses(uses, post, tag_ids, -1)
+        if uses:
+            _count_uses(uses)
+
+
+def trending(limit=10, window=None):
+    window = window or timedelta(hours=getattr(settings, 'HASHTAG_TRENDING_WINDOW_HOURS', 24))
+    since = bucket_start(timezone.now() - window)
+    return list(
+        HashtagBucket.objects.filter(bucket__gte=since)
+        .values('hashtag__name')
+        .annotate(uses=Sum('count'))
+        .order_by('-uses', 'hashtag__name')[:limit]
+    )
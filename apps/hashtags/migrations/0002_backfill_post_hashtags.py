@@ -0,0 +1,43 @@
+import re
+
+from django.db import migrations
+
+HASHTAG_RE = re.compile(r'#(\w{1,64})')
+
+
+def backfill_post_hashtags(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+    Hashtag = apps.get_model('hashtags', 'Hashtag')
+    PostHashtag = apps.get_model('hashtags', 'PostHashtag')
+
+    posts = Post.objects.order_by('id').only('id', 'content', 'created_at')
+    batch = []
+    for post in posts.iterator(chunk_size=2000):
+        batch.append(post)
+        if len(batch) >= 2000:
+            _link(batch, Hashtag, PostHashtag)
+            batch = []
+    if batch:
+        _link(batch, Hashtag, PostHashtag)
+
+
+def _link(posts, Hashtag, PostHashtag):
+    links = {post.id: {m.lower() for m in HASHTAG_RE.findall(post.content or '')} for post in posts}
+    names = set().union(*links.values())
+    Hashtag.objects.bulk_create([Hashtag(name=name) for name in names], ignore_conflicts=True)
+    ids = dict(Hashtag.objects.filter(name__in=names).values_list('name', 'id'))
+    PostHashtag.objects.bulk_create(
+        [PostHashtag(post_id=post.id, hashtag_id=ids[name], created_at=post.created_at) for post in posts for name in links[post.id]],
+        ignore_conflicts=True
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hashtags', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_post_hashtags, migrations.RunPython.noop),
+    ]
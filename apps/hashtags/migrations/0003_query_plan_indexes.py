@@ -0,0 +1,17 @@
+# Generated by Django 5.2.4 on 2026-10-18 01:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hashtags', '0002_backfill_post_hashtags'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='hashtag',
+            index=models.Index(fields=['-created_at', '-id'], name='hashtags_ha_created_0dade6_idx'),
+        ),
+    ]
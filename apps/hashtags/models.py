@@ -0,0 +1,65 @@
+from django.db import models
+from apps.posts.models import Post
+
+class Hashtag(models.Model):
+    name = models.CharField(
+        max_length=64,
+        unique=True
+    )
+
+    created_at = models.DateTimeField(
+        auto_now_add=True
+    )
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-created_at', '-id'])
+        ]
+
+    def __str__(self):
+        return f'#{self.name}'
+
+class PostHashtag(models.Model):
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='post_hashtags'
+    )
+
+    hashtag = models.ForeignKey(
+        Hashtag,
+        on_delete=models.CASCADE,
+        related_name='post_hashtags'
+    )
+
+    # Copy of post.created_at so posts for a tag come newest first from the index
+    created_at = models.DateTimeField()
+
+    class Meta:
+        unique_together = ['post', 'hashtag']
+        indexes = [
+            models.Index(fields=['hashtag', '-created_at'])
+        ]
+
+    def __str__(self):
+        return f'#{self.hashtag.name} on post {self.post_id}'
+
+class HashtagBucket(models.Model):
+    # Uses of a hashtag within one time bucket; trending sums the buckets of a window
+    hashtag = models.ForeignKey(
+        Hashtag,
+        on_delete=models.CASCADE,
+        related_name='buckets'
+    )
+
+    bucket = models.DateTimeField()
+
+    count = models.PositiveIntegerField(
+        default=0
+    )
+
+    class Meta:
+        unique_together = ['bucket', 'hashtag']
+
+    def __str__(self):
+        return f'#{self.hashtag.name} x{self.count} at {self.bucket}'
@@ -0,0 +1,16 @@
+from rest_framework import serializers
+from .models import Hashtag
+
+class HashtagSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Hashtag
+        fields = [
+            'id',
+            'name',
+            'created_at'
+        ]
+        read_only_fields = fields
+
+class TrendingHashtagSerializer(serializers.Serializer):
+    name = serializers.CharField(source='hashtag__name')
+    uses = serializers.IntegerField()
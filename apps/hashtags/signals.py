@@ -0,0 +1,15 @@
+from django.db.models.signals import post_save, pre_delete
+from django.dispatch import receiver
+from apps.posts.models import Post
+from .indexing import index_posts, reindex_post, unindex_post
+
+@receiver(post_save, sender=Post)
+def index_post_hashtags(sender, instance, created, update_fields=None, **kwargs):
+    if created:
+        index_posts([instance])
+    elif update_fields is None or {'content', 'visibility'} & set(update_fields):
+        reindex_post(instance, instance.stored_visibility)
+
+@receiver(pre_delete, sender=Post)
+def unindex_post_hashtags(sender, instance, **kwargs):
+    unindex_post(instance)
@@ -0,0 +1,55 @@
+from django.test import TestCase
+from rest_framework.test import APIClient
+from apps.posts.models import Post
+from apps.users.models import User
+from .indexing import trending
+
+
+class HashtagVisibilityTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='alice', email='alice@example.com', password='seed-password')
+
+    def post(self, content, visibility='public'):
+        return Post.objects.create(author=self.author, content=content, visibility=visibility)
+
+    def uses(self):
+        return {row['hashtag__name']: row['uses'] for row in trending(limit=50) if row['uses']}
+
+    def test_tags_of_hidden_posts_are_not_listed(self):
+        self.post('open #django')
+        self.post('secret #launchplan', visibility='private')
+        self.post('friends only #surprise', visibility='followers')
+
+        response = APIClient().get('/api/hashtags/hashtags/')
+        self.assertEqual([tag['name'] for tag in response.json()['results']], ['django'])
+        self.assertEqual(APIClient().get('/api/hashtags/hashtags/launchplan/').status_code, 404)
+        self.assertEqual(APIClient().get('/api/hashtags/hashtags/django/').status_code, 200)
+        self.assertEqual(self.uses(), {'django': 1})
+
+    def test_trending_follows_visibility_changes(self):
+        post = self.post('draft #python #django', visibility='private')
+        self.assertEqual(self.uses(), {})
+
+        client = APIClient()
+        client.force_authenticate(self.author)
+        response = client.patch(f'/api/posts/posts/{post.id}/', {'visibility': 'public'})
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(self.uses(), {'python': 1, 'django': 1})
+
+        post = Post.objects.get(pk=post.pk)
+        post.content = 'draft #python'
+        post.save()
+        self.assertEqual(self.uses(), {'python': 1})
+
+        post.visibility = 'followers'
+        post.save(update_fields=['visibility'])
+        self.assertEqual(self.uses(), {})
+
+        post.visibility = 'public'
+        post.save()
+        self.post('another #python')
+        self.assertEqual(self.uses(), {'python': 2})
+
+        post.delete()
+        self.assertEqual(self.uses(), {'python': 1})
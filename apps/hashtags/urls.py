@@ -0,0 +1,10 @@
+from rest_framework.routers import DefaultRouter
+from django.urls import path, include
+from .views import HashtagViewSet
+
+router = DefaultRouter()
+router.register(r'hashtags', HashtagViewSet, basename='hashtag')
+
+urlpatterns = [
+    path('', include(router.urls))
+]
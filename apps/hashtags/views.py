@@ -0,0 +1,25 @@
+from django.db.models import Exists, OuterRef
+from rest_framework import viewsets
+from rest_framework.decorators import action
+from rest_framework.response import Response
+from .models import Hashtag, PostHashtag
+from .serializers import HashtagSerializer, TrendingHashtagSerializer
+from .indexing import trending
+
+class HashtagViewSet(viewsets.ReadOnlyModelViewSet):
+    # Only tags some public post uses: the rest would give away what private posts say
+    queryset = Hashtag.objects.filter(
+        Exists(PostHashtag.objects.filter(hashtag=OuterRef('pk'), post__visibility='public'))
+    )
+    serializer_class = HashtagSerializer
+    lookup_field = 'name'
+
+    @action(detail=False, methods=['get'])
+    def trending(self, request):
+        # Summed from time-bucketed counters, never from the post table
+        try:
+            limit = min(int(request.query_params.get('limit', 10)), 50)
+        except ValueError:
+            limit = 10
+        serializer = TrendingHashtagSerializer(trending(limit=limit), many=True)
+        return Response(serializer.data)
@@ -0,0 +1,75 @@
+import asyncio
+
+from rest_framework.exceptions import NotFound
+from apps.core import cache as response_cache
+from apps.core.async_api import async_api_view
+from apps.core.pagination import CreatedAtCursorPagination
+from apps.core.serializers import wants
+from apps.users.models import User
+from .likes import aliked
+from .models import Post
+from .serializers import PostSerializer, PostListSerializer, overlay_viewer_state, post_list_rows
+from .views import visible_posts
+
+# Async versions of PostViewSets list/retrieve for ASGI; same queries, same JSON
+
+NOT_FOUND = 'No Post matches the given query.'
+
+
+async def _none():
+    return None
+
+
+@async_api_view()
+async def post_list(request):
+    paginator, context = CreatedAtCursorPagination(), {'request': request}
+    queryset = visible_posts(request.user, request.query_params)
+    if 'expand' in request.query_params:
+        page = await paginator.apaginate_queryset(queryset, request)
+        return paginator.get_paginated_data(PostListSerializer(page, many=True, context=context).data)
+    lookups, convert = post_list_rows.compile_request(request, context, paginator)
+    page = await paginator.apaginate_queryset(queryset.values_list(*lookups, named=True), request)
+    return paginator.get_paginated_data([convert(row) for row in page])
+
+
+@async_api_view()
+async def post_detail(request, pk):
+    user, queryset = request.user, visible_posts(request.user, request.query_params)
+    cacheable = not {'author', 'tag', 'fields', 'expand'} & request.query_params.keys()
+    key, variant = str(pk), response_cache.request_variant(request)
+    liked = aliked(user, pk) if wants(request.query_params, 'is_liked') else _none()
+
+    data = response_cache.get_body('post', key, variant) if cacheable else None
+    if data is not None:
+        own = user.is_authenticated and data['author_id'] == user.id
+        if data['visibility'] != 'public' and not own:
+            visible, liked = await asyncio.gather(queryset.filter(pk=pk).aexists(), liked)
+            if not visible:
+                raise NotFound(NOT_FOUND)
+        else:
+            liked = await liked
+        return overlay_viewer_state(data, user, liked)
+
+    if cacheable:
+        # As in PostViewSets.retrieve, the author's version is read before the author's row.
+        # The viewer's like doesn't depend on the post, so it goes out alongside.
+        author_id, liked = await asyncio.gather(
+            queryset.filter(pk=pk).values_list('author_id', flat=True).afirst(), liked
+        )
+        if author_id is None:
+            raise NotFound(NOT_FOUND)
+        versions = response_cache.get_versions([
+            response_cache.version_key(Post, key),
+            response_cache.version_key(User, author_id)
+        ])
+    try:
+        if cacheable:
+            instance = await queryset.aget(pk=pk)
+        else:
+            instance, liked = await asyncio.gather(queryset.aget(pk=pk), liked)
+    except Post.DoesNotExist:
+        raise NotFound(NOT_FOUND)
+    data = PostSerializer(instance, context={'request': request, 'shared': True}).data
+    if cacheable:
+        response_cache.set_body('post', key, data, versions, variant)
+    return overlay_viewer_state(data, user, liked)
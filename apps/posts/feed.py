@@ -0,0 +1,193 @@
+import base64
+import heapq
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import Q
+
+from apps.users.models import Relationship, UserStats
+from .models import Post, TimelineEntry
+
+logger = logging.getLogger(__name__)
+
+FANOUT_BATCH_SIZE = 1000
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'FEED_FANOUT_WORKERS', 2),
+                thread_name_prefix='feed-fanout'
+            )
+        return _executor
+
+
+def _run_in_background(func, *args):
+    try:
+        func(*args)
+    except Exception:
+        # Nothing waits on the future, so this is the only place the error shows up
+        logger.exception('Feed job %s failed for %s', func.__name__, args)
+    finally:
+        # Worker threads own their connections; don't leak them between jobs
+        connections.close_all()
+
+
+def schedule(func, *args):
+    # Runs after the surrounding transaction commits so the worker sees the rows
+    if getattr(settings, 'FEED_FANOUT_ASYNC', True):
+        transaction.on_commit(lambda: _get_executor().submit(_run_in_background, func, *args))
+    else:
+        transaction.on_commit(lambda: func(*args))
+
+
+def fan_out_threshold():
+    return getattr(settings, 'FEED_FANOUT_MAX_FOLLOWERS', 5000)
+
+
+def is_fan_in_author(author_id):
+    # Accounts above the threshold are merged into feeds at read time instead
+    return UserStats.objects.filter(user_id=author_id, follower_count__gt=fan_out_threshold()).exists()
+
+
+def fan_in_followees(user):
+    return list(
+        UserStats.objects.filter(
+            user__followers__from_user=user,
+            follower_count__gt=fan_out_threshold()
+        ).values_list('user_id', flat=True)
+    )
+
+
+def _push(posts, user_ids):
+    TimelineEntry.objects.bulk_create(
+        [
+            TimelineEntry(user_id=uid, post_id=post.id, created_at=post.created_at)
+            for post in posts for uid in user_ids
+        ],
+        ignore_conflicts=True
+    )
+
+
+def fan_out_post(post_id):
+    fan_out_posts([post_id])
+
+
+def fan_out_posts(post_ids):
+    # Posts of one author share a single pass over that author's followers
+    by_author = {}
+    for post in Post.objects.filter(pk__in=post_ids).only('id', 'author_id', 'created_at', 'visibility'):
+        by_author.setdefault(post.author_id, []).append(post)
+
+    for author_id, posts in by_author.items():
+        # Authors always see their own posts
+        _push(posts, [author_id])
+        shared = [post for post in posts if post.visibility != 'private']
+        if not shared or is_fan_in_author(author_id):
+            continue
+        follower_ids = (
+            Relationship.objects.filter(to_user_id=author_id)
+            .values_list('from_user_id', flat=True)
+            .iterator(chunk_size=FANOUT_BATCH_SIZE)
+        )
+        # Keep each insert around FANOUT_BATCH_SIZE rows
+        batch_size = max(1, FANOUT_BATCH_SIZE // len(shared))
+        batch = []
+        for uid in follower_ids:
+            batch.append(uid)
+            if len(batch) >= batch_size:
+                _push(shared, batch)
+                batch = []
+        if batch:
+            _push(shared, batch)
+
+
+def backfill_timeline(user_id, author_id):
+    # A new follow pulls in the author's recent posts
+    if is_fan_in_author(author_id):
+        return
+    posts = (
+        Post.objects.filter(author_id=author_id)
+        .exclude(visibility='private')
+        .only('id', 'created_at')
+        .order_by('-created_at')[:getattr(settings, 'FEED_BACKFILL_POSTS', 20)]
+    )
+    TimelineEntry.objects.bulk_create(
+        [TimelineEntry(user_id=user_id, post_id=p.id, created_at=p.created_at) for p in posts],
+        ignore_conflicts=True
+    )
+
+
+def purge_timeline(user_id, author_id):
+    TimelineEntry.objects.filter(user_id=user_id, post__author_id=author_id).delete()
+
+
+def encode_position(post):
+    raw = f'{post.created_at.isoformat()}|{post.id}'
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_position(value):
+    try:
+        created_at, post_id = base64.urlsafe_b64decode(value.encode()).decode().split('|')
+        return datetime.fromisoformat(created_at), int(post_id)
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+
+def page_size():
+    return getattr(settings, 'FEED_PAGE_SIZE', 20)
+
+
+def _visible_entries(user):
+    return TimelineEntry.objects.filter(user=user).filter(
+        Q(post__author=user) | ~Q(post__visibility='private')
+    )
+
+
+def timeline_page(user, position=None, limit=None):
+    entries = _visible_entries(user)
+    if position:
+        created_at, post_id = position
+        entries = entries.filter(created_at__lte=created_at).exclude(created_at=created_at, post_id__gte=post_id)
+    return entries.select_related('post__author').order_by('-created_at', '-post_id')[:limit or page_size()]
+
+
+def pulled_page(author_ids, position=None, limit=None):
+    # Recent posts of followed fan-in authors, read at request time
+    recent = Post.objects.filter(author_id__in=author_ids).exclude(visibility='private')
+    if position:
+        created_at, post_id = position
+        recent = recent.filter(created_at__lte=created_at).exclude(created_at=created_at, id__gte=post_id)
+    return recent.select_related('author').order_by('-created_at', '-id')[:limit or page_size()]
+
+
+def get_feed(user, position=None, limit=None):
+    limit = limit or page_size()
+
+    posts = [entry.post for entry in timeline_page(user, position, limit)]
+
+    pulled = fan_in_followees(user)
+    if not pulled:
+        return posts
+
+    recent = pulled_page(pulled, position, limit)
+
+    merged, seen = [], set()
+    for post in heapq.merge(posts, recent, key=lambda p: (p.created_at, p.id), reverse=True):
+        if post.id in seen:
+            continue
+        seen.add(post.id)
+        merged.append(post)
+        if len(merged) == limit:
+            break
+    return merged
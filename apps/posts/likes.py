@@ -0,0 +1,218 @@
+import atexit
+import logging
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import connection, connections, transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+
+from apps.core import cache as response_cache
+from .models import Post, Like
+
+logger = logging.getLogger(__name__)
+
+
+class LikeBuffer:
+    """
+    Coalesces like/unlike taps in memory and writes them in batches.
+
+    Pending intents are keyed by ``(user_id, post_id)`` and remember both the
+    state the user started from and the state they want, so a like followed by
+    an unlike before the next flush cancels out and never reaches the database.
+    A background thread flushes every ``LIKE_BUFFER_FLUSH_INTERVAL`` seconds
+    with one bulk insert, one delete per post and one counter update per post.
+    The batch being written stays visible to readers until its transaction
+    commits, and goes back into the buffer if the write fails.
+    """
+
+    def __init__(self):
+        self._pending = {}  # (user_id, post_id) -> (original, desired)
+        self._deltas = defaultdict(int)  # post_id -> pending likes_count change
+        self._inflight = {}  # the batch a flush is writing, same shape as _pending
+        self._inflight_deltas = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+
+    @property
+    def enabled(self):
+        return getattr(settings, 'LIKE_BUFFER_ENABLED', False)
+
+    def _ensure_worker(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='like-buffer', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(getattr(settings, 'LIKE_BUFFER_FLUSH_INTERVAL', 1.0))
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception:
+                logger.exception('Flushing buffered likes failed')
+            finally:
+                connections.close_all()
+
+    def toggle(self, user_id, post_id):
+        key = (user_id, post_id)
+        # Read to write in one critical section, so two taps can't both start from the same state.
+        # The database is only read for a key with nothing buffered; a batch being written stays
+        # in _inflight until it commits, so that read can't miss it.
+        with self._lock:
+            entry = self._pending.get(key)
+            inflight = self._inflight.get(key)
+            if entry is not None:
+                original, desired = entry[0], not entry[1]
+            else:
+                # Starts from the state the batch being written leaves behind
+                original = inflight[1] if inflight is not None else (
+                    Like.objects.filter(user_id=user_id, post_id=post_id).exists()
+                )
+                desired = not original
+
+            if entry is not None:
+                self._pending.pop(key)
+                self._deltas[post_id] -= 1 if entry[1] else -1
+            if desired != original:
+                self._pending[key] = (original, desired)
+                self._deltas[post_id] += 1 if desired else -1
+            size = len(self._pending)
+
+        self._ensure_worker()
+        if size >= getattr(settings, 'LIKE_BUFFER_MAX_PENDING', 5000):
+            self._wakeup.set()
+        return desired
+
+    # Read-your-own-writes: overlay unflushed and uncommitted intents on database state
+
+    def _entry(self, key):
+        # Caller holds _lock; the newest intent wins
+        entry = self._pending.get(key)
+        return self._inflight.get(key) if entry is None else entry
+
+    def is_liked(self, user_id, post_id):
+        with self._lock:
+            entry = self._entry((user_id, post_id))
+        return None if entry is None else entry[1]
+
+    def overlay_liked(self, user_id, post_ids, liked):
+        with self._lock:
+            for post_id in post_ids:
+                entry = self._entry((user_id, post_id))
+                if entry is None:
+                    continue
+                if entry[1]:
+                    liked.add(post_id)
+                else:
+                    liked.discard(post_id)
+        return liked
+
+    def likes_delta(self, post_id):
+        with self._lock:
+            return self._deltas.get(post_id, 0) + self._inflight_deltas.get(post_id, 0)
+
+    def flush(self):
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, {}
+                self._inflight, self._inflight_deltas = batch, self._deltas
+                self._deltas = defaultdict(int)
+            if not batch:
+                return 0
+
+            try:
+                self._write(batch)
+            except Exception:
+                with self._lock:
+                    self._restore(batch)
+                    self._inflight, self._inflight_deltas = {}, {}
+                raise
+            with self._lock:
+                self._inflight, self._inflight_deltas = {}, {}
+            return len(batch)
+
+    def _restore(self, batch):
+        # Caller holds _lock. Taps made during the failed write are newer than the batch
+        for key, (original, desired) in batch.items():
+            newer = self._pending.get(key)
+            if newer is not None:
+                desired = newer[1]
+            if desired == original:
+                self._pending.pop(key, None)
+            else:
+                self._pending[key] = (original, desired)
+        self._deltas = defaultdict(int)
+        for (_, post_id), (_, desired) in self._pending.items():
+            self._deltas[post_id] += 1 if desired else -1
+
+    def _write(self, batch):
+        post_ids = {post_id for _, post_id in batch}
+        user_ids = {user_id for user_id, _ in batch}
+        with transaction.atomic():
+            live_posts = set(Post.objects.filter(id__in=post_ids).values_list('id', flat=True))
+            existing = set(
+                Like.objects.filter(post_id__in=post_ids, user_id__in=user_ids).values_list('user_id', 'post_id')
+            )
+
+            to_create, to_delete = [], defaultdict(list)
+            deltas = defaultdict(int)
+            for (user_id, post_id), (_, desired) in batch.items():
+                if post_id not in live_posts:
+                    continue
+                if desired and (user_id, post_id) not in existing:
+                    to_create.append(Like(user_id=user_id, post_id=post_id))
+                    deltas[post_id] += 1
+                elif not desired and (user_id, post_id) in existing:
+                    to_delete[post_id].append(user_id)
+                    deltas[post_id] -= 1
+
+            Like.objects.bulk_create(to_create, ignore_conflicts=True)
+            table = connection.ops.quote_name(Like._meta.db_table)
+            with connection.cursor() as cursor:
+                for post_id, users in to_delete.items():
+                    # Plain DELETE: the per-row post_delete signal would adjust the counter a second time
+                    cursor.execute(
+                        f'DELETE FROM {table} WHERE post_id = %s AND user_id IN ({", ".join(["%s"] * len(users))})',
+                        [post_id, *users]
+                    )
+            for post_id, delta in deltas.items():
+                if delta:
+                    Post.objects.filter(pk=post_id).update(likes_count=Greatest(F('likes_count') + delta, 0))
+                    response_cache.bump_on_commit(Post, post_id)
+
+
+like_buffer = LikeBuffer()
+atexit.register(like_buffer.flush)
+
+
+def liked_post_ids(user, posts):
+    # One IN query for a whole page instead of an EXISTS per post
+    return liked_ids(user, [post.id for post in posts])
+
+
+def liked_ids(user, post_ids):
+    if not user or not user.is_authenticated or not post_ids:
+        return set()
+    liked = set(
+        Like.objects.filter(user=user, post_id__in=post_ids).values_list('post_id', flat=True)
+    )
+    if like_buffer.enabled:
+        like_buffer.overlay_liked(user.id, post_ids, liked)
+    return liked
+
+
+async def aliked(user, post_id):
+    if not user or not user.is_authenticated:
+        return False
+    if like_buffer.enabled:
+        pending = like_buffer.is_liked(user.id, post_id)
+        if pending is not None:
+            return pending
+    return await Like.objects.filter(user=user, post_id=post_id).aexists()
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from apps.posts import search
+
+
+class Command(BaseCommand):
+    help = 'Recreate the FTS5 post search table and triggers, then reindex every post.'
+
+    def handle(self, *args, **options):
+        if not search.is_supported():
+            raise CommandError('Full-text search requires the SQLite backend.')
+
+        table = search.FTS_TABLE
+        # One transaction holds SQLite's write lock for the whole reload, so no post can be
+        # written (and indexed by the triggers) between clearing the index and refilling it
+        with transaction.atomic(), connection.cursor() as cursor:
+            search.ensure_search_index(cursor)
+            cursor.execute(f"INSERT INTO {table}({table}) VALUES ('rebuild')")
+            cursor.execute('SELECT COUNT(*) FROM posts_post')
+            indexed = cursor.fetchone()[0]
+
+        with connection.cursor() as cursor:
+            cursor.execute(f"INSERT INTO {table}({table}) VALUES ('optimize')")
+        self.stdout.write(self.style.SUCCESS(f'Search index rebuilt: {indexed} posts.'))
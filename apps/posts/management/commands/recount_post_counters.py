@@ -0,0 +1,58 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from apps.comments.models import Comment
+from apps.posts.models import Post, Like
+
+
+def _count_subquery(model):
+    rows = (
+        model.objects.filter(post=OuterRef('pk'))
+        .order_by()
+        .values('post')
+        .annotate(n=Count('*'))
+        .values('n')
+    )
+    return Coalesce(Subquery(rows, output_field=IntegerField()), 0)
+
+
+class Command(BaseCommand):
+    help = 'Recompute Post.likes_count and Post.comments_count in chunks, fixing any drift.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        last_id = 0
+        checked = fixed = 0
+
+        while True:
+            with transaction.atomic():
+                posts = list(
+                    Post.objects.filter(pk__gt=last_id)
+                    .order_by('pk')
+                    .only('id', 'likes_count', 'comments_count')
+                    .annotate(
+                        actual_likes=_count_subquery(Like),
+                        actual_comments=_count_subquery(Comment)
+                    )[:chunk_size]
+                )
+                if not posts:
+                    break
+
+                drifted = []
+                for post in posts:
+                    if post.likes_count != post.actual_likes or post.comments_count != post.actual_comments:
+                        post.likes_count = post.actual_likes
+                        post.comments_count = post.actual_comments
+                        drifted.append(post)
+                if drifted:
+                    Post.objects.bulk_update(drifted, ['likes_count', 'comments_count'])
+
+            checked += len(posts)
+            fixed += len(drifted)
+            last_id = posts[-1].id
+
+        self.stdout.write(self.style.SUCCESS(f'Checked {checked} posts, fixed {fixed}.'))
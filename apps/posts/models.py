@@ -1,5 +1,39 @@
 from django.db import models
+from django.db.models import Q
 from django.conf import settings
+from apps.users.models import Relationship
+from apps.core.images import image_storage, post_image_path
+
+class PostQuerySet(models.QuerySet):
+    # Disjoint parts of the visible_to() predicate, kept for keyset_branches()
+    _visibility = None
+
+    def _clone(self):
+        clone = super()._clone()
+        clone._visibility = self._visibility
+        return clone
+
+    def visible_to(self, user):
+        # Public posts, the user's own posts, and followers-only posts of accounts they follow,
+        # as one SQL predicate so list and detail reads filter in the database.
+        public = Q(visibility='public')
+        if user is None or not user.is_authenticated:
+            return self.filter(public)
+        followed = Relationship.objects.filter(from_user=user).values('to_user')
+        own = Q(author=user) & ~public
+        shared = Q(visibility='followers', author__in=followed) & ~Q(author=user)
+        queryset = self.filter(public | own | shared)
+        queryset._visibility = (public, own, shared)
+        return queryset
+
+    def keyset_branches(self):
+        # One queryset per part of visible_to(); each pages in order on the (visibility, ...) or
+        # (author, ...) index, where the OR of all three would be sorted in full
+        if self._visibility is None:
+            return None
+        return [self.filter(part) for part in self._visibility]
+
+COUNTER_FIELDS = ('likes_count', 'comments_count')
 
 class Post(models.Model):
     VISIBILITY_CHOICES = [
@@ -18,11 +52,19 @@ class Post(models.Model):
     )
 
     image = models.ImageField(
-        upload_to='posts/images',
+        upload_to=post_image_path,
+        storage=image_storage,
         blank=True,
         null=True
     )
 
+    # Resized WebP/JPEG renditions of image, filled in by apps.core.images
+    image_variants = models.JSONField(
+        default=dict,
+        blank=True,
+        editable=False
+    )
+
     created_at = models.DateTimeField(
         auto_now_add=True
     )
@@ -36,9 +78,63 @@ class Post(models.Model):
         choices=VISIBILITY_CHOICES,
         default='private'
     )
+
+    objects = PostQuerySet.as_manager()
+
+    # Denormalized counters, kept in step with Like/Comment rows by signals
+    likes_count = models.PositiveIntegerField(
+        default=0
+    )
+
+    comments_count = models.PositiveIntegerField(
+        default=0
+    )
     
     class Meta:
-        ordering = ['-created_at']
+        ordering = ['-created_at', '-id']
+        indexes = [
+            models.Index(fields=['-created_at', '-id']),
+            models.Index(fields=['author', '-created_at', '-id']),
+            models.Index(fields=['visibility', '-created_at', '-id']),
+            models.Index(fields=['visibility', 'author', '-created_at'])
+        ]
+
+    # Visibility as last read from or written to the row; None for a new or deferred post
+    stored_visibility = None
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance.stored_visibility = instance.__dict__.get('visibility')
+        return instance
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            # The counters only move by F() updates; writing back the loaded values would undo
+            # the likes and comments that landed since this instance was read
+            skipped = {*COUNTER_FIELDS, *self.get_deferred_fields()}
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.attname not in skipped and field.name not in skipped
+            ]
+        super().save(*args, **kwargs)
+        # After post_save, so its receivers can still compare the old value with the new
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or 'visibility' in update_fields:
+            self.stored_visibility = self.visibility
+
+    def is_visible_to(self, user):
+        # visible_to() for a post already loaded. An access check, so the follow is read from
+        # the table: the follow graph is per process and can lag another worker's unfollow.
+        if self.visibility == 'public':
+            return True
+        if user is None or not user.is_authenticated:
+            return False
+        if self.author_id == user.id:
+            return True
+        return self.visibility == 'followers' and Relationship.objects.filter(
+            from_user_id=user.id, to_user_id=self.author_id
+        ).exists()
 
     def __str__(self):
         return f'Post {self.id} by {self.author.username}'
@@ -62,4 +158,31 @@ class Like(models.Model):
 
     class Meta:
         unique_together = ['user', 'post'] # One user can like a post just once
-    
\ No newline at end of file
+
+class TimelineEntry(models.Model):
+    # Materialized home feed row: one per (reader, post), written by the fan-out step
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries'
+    )
+
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries'
+    )
+
+    # Copy of post.created_at so a feed page is a range scan on this table alone
+    created_at = models.DateTimeField()
+
+    class Meta:
+        # post_id, not post: ordering by the relation would sort by Post's own ordering
+        ordering = ['-created_at', '-post_id']
+        unique_together = ['user', 'post']
+        indexes = [
+            models.Index(fields=['user', '-created_at', '-post'])
+        ]
+
+    def __str__(self):
+        return f'Post {self.post_id} in feed of user {self.user_id}'
@@ -0,0 +1,121 @@
+import re
+from base64 import b64decode, b64encode
+
+from django.db import connection
+
+from .models import Post
+
+FTS_TABLE = 'posts_post_fts'
+
+# External-content FTS5 table over posts_post.content, kept in sync by triggers.
+# Django rebuilds SQLite tables for some schema changes, which drops triggers,
+# so everything here is idempotent and rebuild_post_search_index re-runs it.
+SCHEMA = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        content, content='posts_post', content_rowid='id'
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON posts_post BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, content) VALUES (new.id, new.content);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON posts_post BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, content) VALUES ('delete', old.id, old.content);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE OF content ON posts_post BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, content) VALUES ('delete', old.id, old.content);
+        INSERT INTO {FTS_TABLE}(rowid, content) VALUES (new.id, new.content);
+    END""",
+]
+
+TRIGGERS = [f'{FTS_TABLE}_ai', f'{FTS_TABLE}_ad', f'{FTS_TABLE}_au']
+
+DROP = [
+    *(f'DROP TRIGGER IF EXISTS {trigger}' for trigger in TRIGGERS),
+    f'DROP TABLE IF EXISTS {FTS_TABLE}',
+]
+
+
+def is_supported(using=connection):
+    return using.vendor == 'sqlite'
+
+
+def ensure_search_index(cursor):
+    for statement in SCHEMA:
+        cursor.execute(statement)
+
+
+def repair_search_index(sender, using='default', **kwargs):
+    # post_migrate: a migration that rebuilt posts_post took the triggers with it,
+    # so put them back and reindex the rows written while they were missing
+    from django.db import connections
+    connection = connections[using]
+    if not is_supported(connection):
+        return
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT type, name FROM sqlite_master WHERE name IN (%s, %s, %s, %s)", [FTS_TABLE, *TRIGGERS])
+        existing = {name for _, name in cursor.fetchall()}
+        if FTS_TABLE not in existing or existing.issuperset(TRIGGERS):
+            return
+        ensure_search_index(cursor)
+        cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+
+
+def drop_search_index(cursor):
+    for statement in DROP:
+        cursor.execute(statement)
+
+
+def match_expression(query):
+    # Quote every term so user input can't inject FTS5 query syntax; the last term matches as a prefix
+    terms = re.findall(r'\w+', query)
+    if not terms:
+        return None
+    quoted = [f'"{term}"' for term in terms]
+    quoted[-1] += '*'
+    return ' '.join(quoted)
+
+
+def encode_cursor(score, post_id):
+    return b64encode(f'{score!r}|{post_id}'.encode('ascii')).decode('ascii')
+
+
+def decode_cursor(value):
+    try:
+        score, post_id = b64decode(value.encode('ascii')).decode('ascii').split('|')
+        return float(score), int(post_id)
+    except (ValueError, UnicodeError):
+        return None
+
+
+def search_posts(queryset, query, after=None, limit=20):
+    """
+    Rank posts matching ``query`` by BM25 within ``queryset``.
+
+    Returns up to ``limit`` + 1 ``(post_id, score)`` pairs, best match first,
+    strictly after the ``(score, post_id)`` position ``after``.
+    """
+    expression = match_expression(query)
+    if expression is None:
+        return []
+
+    scope_sql, scope_params = queryset.order_by().values('id').query.sql_with_params()
+    sql = (
+        f'SELECT rowid, bm25({FTS_TABLE}) FROM {FTS_TABLE} '
+        f'WHERE {FTS_TABLE} MATCH %s AND rowid IN ({scope_sql})'
+    )
+    params = [expression, *scope_params]
+    if after is not None:
+        score, post_id = after
+        sql += f' AND (bm25({FTS_TABLE}) > %s OR (bm25({FTS_TABLE}) = %s AND rowid > %s))'
+        params += [score, score, post_id]
+    sql += f' ORDER BY bm25({FTS_TABLE}), rowid LIMIT %s'
+    params.append(limit + 1)
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.fetchall()
+
+
+def load_ranked(rows, queryset=None):
+    queryset = queryset if queryset is not None else Post.objects.all()
+    posts = queryset.in_bulk([post_id for post_id, _ in rows])
+    return [(posts[post_id], score) for post_id, score in rows if post_id in posts]
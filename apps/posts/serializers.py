@@ -1,20 +1,38 @@
 from rest_framework import serializers
 from .models import Post
+from .likes import like_buffer, liked_ids
+from . import feed
+from apps.core.images import variant_urls
+from apps.core.rows import ValuesRowSerializer, datetime_column, file_column
+from apps.core.serializers import SparseFieldsMixin
+from apps.hashtags.indexing import index_posts
+from apps.users import stats
 
-class PostSerializer(serializers.ModelSerializer):
+class PostBulkSerializer(serializers.ListSerializer):
+    def create(self, validated_data):
+        # bulk_create sends no post_save, so this does what the Post receivers would,
+        # once for the whole batch (image variants don't apply: bulk bodies are JSON)
+        author = self.context['request'].user
+        posts = Post.objects.bulk_create([Post(author=author, **item) for item in validated_data])
+        stats.increment(author.id, post_count=len(posts))
+        index_posts(posts)
+        feed.schedule(feed.fan_out_posts, [post.id for post in posts])
+        return posts
+
+
+class PostSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     author_username = serializers.CharField(
         source='author.username', 
         read_only=True
     )
 
+    # The FK column itself: no need to load the author for it
     author_id = serializers.IntegerField(
-        source='author.id',
         read_only=True
     )
 
-    likes_count = serializers.SerializerMethodField()
     is_liked = serializers.SerializerMethodField()
-    comments_count = serializers.SerializerMethodField()
+    image_variants = serializers.SerializerMethodField()
 
     class Meta:
         model = Post
@@ -24,6 +42,7 @@ class PostSerializer(serializers.ModelSerializer):
             'author_id',
             'content',
             'image',
+            'image_variants',
             'created_at',
             'updated_at',
             'visibility',
@@ -31,7 +50,9 @@ class PostSerializer(serializers.ModelSerializer):
             'is_liked',
             'comments_count'
         ]
-        read_only_fields = ['id', 'created_at', 'updated_at', 'author_username', 'author_id', 'likes_count', 'is_liked']
+        read_only_fields = ['id', 'created_at', 'updated_at', 'author_username', 'author_id', 'likes_count', 'is_liked', 'comments_count', 'image_variants']
+        list_serializer_class = PostBulkSerializer
+        expandable_fields = {'author': ('apps.users.serializers.PublicUserSerializer', {})}
 
     def validate_content(self, value):
         if len(value) > 280:
@@ -50,16 +71,33 @@ class PostSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError("Visibility is not correct")
         return value
 
-    def get_likes_count(self, obj):
-        return obj.likes.count()
-    
     def get_is_liked(self, obj):
+        # Shared bodies are cached for every viewer; overlay_viewer_state fills this in
+        if self.context.get('shared'):
+            return False
+        # Set by the view when serializing a page (see PostViewSets.get_serializer)
+        liked = self.context.get('liked_post_ids')
+        if liked is not None:
+            return obj.id in liked
         request = self.context.get('request')
         user = request.user if request else None
-        return obj.likes.filter(user=user).exists() if user and user.is_authenticated else False
-    
-    def get_comments_count(self, obj):
-        return obj.comments.count()
+        if not user or not user.is_authenticated:
+            return False
+        if like_buffer.enabled:
+            pending = like_buffer.is_liked(user.id, obj.id)
+            if pending is not None:
+                return pending
+        return obj.likes.filter(user=user).exists()
+
+    def get_image_variants(self, obj):
+        return variant_urls(obj.image, obj.image_variants, self.context.get('request'))
+
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        # Unflushed taps from the like buffer are not in the column yet
+        if like_buffer.enabled and 'likes_count' in data and not self.context.get('shared'):
+            data['likes_count'] = max(data['likes_count'] + like_buffer.likes_delta(instance.id), 0)
+        return data
     
     def create(self, validated_data):
         request = self.context.get('request')
@@ -67,14 +105,23 @@ class PostSerializer(serializers.ModelSerializer):
             validated_data['author'] = request.user
         return super().create(validated_data)
     
-class PostListSerializer(serializers.ModelSerializer):
+def overlay_viewer_state(data, user, liked=None):
+    # Per-request fields on top of a shared post body
+    data = dict(data)
+    if 'is_liked' in data:
+        data['is_liked'] = data['id'] in liked_ids(user, [data['id']]) if liked is None else liked
+    if like_buffer.enabled and 'likes_count' in data:
+        data['likes_count'] = max(data['likes_count'] + like_buffer.likes_delta(data['id']), 0)
+    return data
+
+class PostListSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     author_username = serializers.CharField(
         source='author.username',
         read_only=True
     )
 
+    # The FK column itself: no need to load the author for it
     author_id = serializers.IntegerField(
-        source='author.id',
         read_only=True
     )
 
@@ -89,3 +136,14 @@ class PostListSerializer(serializers.ModelSerializer):
             'created_at'
         ]
         read_only_fields = ['id', 'author_username', 'author_id', 'created_at']
+        expandable_fields = {'author': ('apps.users.serializers.PublicUserSerializer', {})}
+
+# PostListSerializer's output, built from values_list() rows (PostViewSets.list)
+post_list_rows = ValuesRowSerializer(
+    id='pk',
+    author_username='author__username',
+    author_id='author_id',
+    content='content',
+    image=('image', file_column(Post, 'image')),
+    created_at=('created_at', datetime_column)
+)
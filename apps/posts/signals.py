@@ -0,0 +1,61 @@
+from django.db.models import F
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from apps.users.models import Relationship
+from apps.users import stats
+from apps.core.images import schedule_variants
+from apps.core import cache as response_cache
+from .models import Post, Like
+from . import feed
+
+@receiver(post_save, sender=Post)
+def fan_out_new_post(sender, instance, created, update_fields=None, **kwargs):
+    # A private post was never pushed, so it goes out when it's first shared
+    shared = instance.visibility != 'private' and instance.stored_visibility == 'private' and (
+        update_fields is None or 'visibility' in update_fields
+    )
+    if created or shared:
+        feed.schedule(feed.fan_out_post, instance.id)
+
+@receiver(post_save, sender=Post)
+def count_new_post(sender, instance, created, **kwargs):
+    if created:
+        stats.increment(instance.author_id, post_count=1)
+
+@receiver(post_delete, sender=Post)
+def count_deleted_post(sender, instance, **kwargs):
+    stats.decrement(instance.author_id, post_count=1)
+
+@receiver(post_save, sender=Relationship)
+def backfill_on_follow(sender, instance, created, **kwargs):
+    if created:
+        feed.schedule(feed.backfill_timeline, instance.from_user_id, instance.to_user_id)
+
+@receiver(post_delete, sender=Relationship)
+def purge_on_unfollow(sender, instance, **kwargs):
+    feed.schedule(feed.purge_timeline, instance.from_user_id, instance.to_user_id)
+
+@receiver(post_save, sender=Like)
+def increment_likes_count(sender, instance, created, **kwargs):
+    if created:
+        Post.objects.filter(pk=instance.post_id).update(likes_count=F('likes_count') + 1)
+
+@receiver(post_delete, sender=Like)
+def decrement_likes_count(sender, instance, **kwargs):
+    Post.objects.filter(pk=instance.post_id, likes_count__gt=0).update(likes_count=F('likes_count') - 1)
+
+@receiver(post_save, sender=Post)
+def process_post_image(sender, instance, **kwargs):
+    schedule_variants(instance, 'image', 'image_variants')
+
+# Cached detail bodies (apps.core.cache) are keyed by these versions
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def invalidate_cached_post(sender, instance, **kwargs):
+    response_cache.bump_on_commit(Post, instance.pk)
+
+@receiver(post_save, sender=Like)
+@receiver(post_delete, sender=Like)
+def invalidate_cached_post_likes(sender, instance, **kwargs):
+    response_cache.bump_on_commit(Post, instance.post_id)
@@ -1,3 +1,327 @@
-from django.test import TestCase
+import threading
+import time
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import QuerySet
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+from apps.core import cache as response_cache
+from apps.core.testing import SeededAPITestCase
+from apps.users.models import Relationship, User, UserStats
+from . import feed
+from .likes import LikeBuffer, like_buffer
+from .models import Like, Post, TimelineEntry
+
+
+class PostQueryCountTests(SeededAPITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        # The busiest reader and writer in the seeded graph
+        cls.reader = User.objects.get(pk=UserStats.objects.order_by('-following_count').values('user_id')[:1])
+        cls.author = User.objects.get(pk=UserStats.objects.order_by('-post_count').values('user_id')[:1])
+        cls.post = Post.objects.filter(visibility='public').order_by('-likes_count').first()
+        cls.hidden = Post.objects.filter(visibility='private').exclude(author=cls.reader).first()
+
+    def test_list(self):
+        self.assertMaxQueries(1, '/api/posts/posts/')
+        # Signed in: one range scan per visibility branch (public, own, followed)
+        self.assertMaxQueries(3, '/api/posts/posts/', self.reader)
+        self.assertMaxQueries(3, f'/api/posts/posts/?author={self.author.id}', self.reader)
+        self.assertMaxQueries(3, '/api/posts/posts/?tag=python', self.reader)
+        self.assertMaxQueries(3, '/api/posts/posts/?fields=id,content', self.reader)
+        self.assertMaxQueries(3, '/api/posts/posts/?expand=author', self.reader)
+
+    def test_list_pages_match_visible_posts(self):
+        # The merged branch pages walk the same rows, in the same order, as the plain OR predicate
+        expected = list(
+            Post.objects.filter(pk__in=Post.objects.visible_to(self.reader).values('pk'))
+            .order_by('-created_at', '-id').values_list('id', flat=True)
+        )
+        for url in ('/api/posts/posts/?page_size=7&fields=id', '/api/posts/async/posts/?page_size=7&fields=id'):
+            seen, pages = [], []
+            while url:
+                response = self.request('get', url, self.reader)[0]
+                body = response.json()
+                seen += [post['id'] for post in body['results']]
+                pages.append(body)
+                url = body['next']
+            self.assertEqual(seen, expected)
+            # And back again from the last page
+            back = []
+            url = pages[-1]['previous']
+            while url:
+                body = self.request('get', url, self.reader)[0].json()
+                back = [post['id'] for post in body['results']] + back
+                url = body['previous']
+            self.assertEqual(back + [post['id'] for post in pages[-1]['results']], expected)
+
+    def test_list_does_not_scale_with_page_size(self):
+        self.assertQueriesConstant('/api/posts/posts/', self.reader)
+        self.assertQueriesConstant('/api/posts/posts/?expand=author', self.reader)
+        self.assertQueriesConstant('/api/posts/async/posts/', self.reader)
+
+    def test_retrieve(self):
+        url = f'/api/posts/posts/{self.post.id}/'
+        self.assertMaxQueries(3, url, self.reader)
+        # Served from the response cache: only the viewer's like is looked up
+        self.assertMaxQueries(1, url, self.reader)
+        self.assertMaxQueries(0, url)
+        self.assertMaxQueries(1, f'/api/posts/posts/{self.hidden.id}/', self.reader, status=404)
+
+    def test_async_retrieve(self):
+        self.assertMaxQueries(3, f'/api/posts/async/posts/{self.post.id}/', self.reader)
+
+    def test_author_rename_after_row_is_read(self):
+        # A rename that commits between reading the post row and storing the body must not
+        # leave the old username cached under the author's new version
+        get = QuerySet.get
+        for url in (f'/api/posts/posts/{self.post.id}/', f'/api/posts/async/posts/{self.post.id}/'):
+            caches[settings.RESPONSE_CACHE_ALIAS].clear()
+            name = f'renamed{len(url)}'
+
+            def get_then_rename(queryset, *args, **kwargs):
+                instance = get(queryset, *args, **kwargs)
+                if isinstance(instance, Post):
+                    User.objects.filter(pk=instance.author_id).update(username=name)
+                    response_cache.bump(User, instance.author_id)
+                return instance
+
+            with mock.patch.object(QuerySet, 'get', get_then_rename):
+                self.request('get', url)
+            self.assertEqual(self.request('get', url)[0].json()['author_username'], name)
+
+    def test_feed(self):
+        response = self.assertMaxQueries(3, '/api/posts/posts/feed/', self.reader)
+        self.assertTrue(response.data['results'])
+
+    def test_feed_does_not_scale_with_page_size(self):
+        counts = []
+        for size in (5, 50):
+            with override_settings(FEED_PAGE_SIZE=size):
+                response, queries = self.request('get', '/api/posts/posts/feed/', self.reader)
+            self.assertEqual(len(response.data['results']), size)
+            counts.append(len(queries))
+        self.assertEqual(counts[0], counts[1])
+
+    def test_search(self):
+        self.assertMaxQueries(3, '/api/posts/posts/search/?q=coffee', self.reader)
+        self.assertQueriesConstant('/api/posts/posts/search/?q=coffee', self.reader)
+
+    def test_rebuild_search_index(self):
+        with connection.cursor() as cursor:
+            cursor.execute("INSERT INTO posts_post_fts(posts_post_fts) VALUES ('delete-all')")
+        self.assertFalse(self.request('get', '/api/posts/posts/search/?q=coffee', self.reader)[0].json()['results'])
+        call_command('rebuild_post_search_index', stdout=StringIO())
+        with connection.cursor() as cursor:
+            cursor.execute("INSERT INTO posts_post_fts(posts_post_fts, rank) VALUES ('integrity-check', 1)")
+        self.assertTrue(self.request('get', '/api/posts/posts/search/?q=coffee', self.reader)[0].json()['results'])
+
+    def test_bulk_fetch(self):
+        ids = ','.join(str(pk) for pk in Post.objects.values_list('pk', flat=True)[:50])
+        self.assertMaxQueries(2, f'/api/posts/posts/bulk/?ids={ids}', self.reader)
+
+    def test_create(self):
+        data = {'content': 'shipping the release #python', 'visibility': 'public'}
+        self.assertMaxQueries(10, '/api/posts/posts/', self.author, method='post', status=201, data=data)
+
+    def test_bulk_create_does_not_scale_with_items(self):
+        counts = []
+        for n in (2, 20):
+            data = [{'content': f'post {i} #django', 'visibility': 'public'} for i in range(n)]
+            response, queries = self.request('post', '/api/posts/posts/bulk/', self.author, data=data, format='json')
+            self.assertEqual(response.status_code, 201, response.data)
+            counts.append(len(queries))
+        self.assertEqual(counts[0], counts[1])
+
+    def test_like(self):
+        post = Post.objects.filter(visibility='public').exclude(likes__user=self.reader).first()
+        url = f'/api/posts/posts/{post.id}/like/'
+        self.assertMaxQueries(8, url, self.reader, method='post', status=201)
+
+    def test_hashtags(self):
+        self.assertMaxQueries(1, '/api/hashtags/hashtags/')
+        self.assertMaxQueries(1, '/api/hashtags/hashtags/trending/')
+
+
+@override_settings(FEED_FANOUT_ASYNC=False)
+class FeedFanOutTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author, cls.follower = [
+            User.objects.create_user(username=f'user{i}', email=f'user{i}@example.com', password='seed-password')
+            for i in range(2)
+        ]
+        Relationship.objects.create(from_user=cls.follower, to_user=cls.author)
+
+    def timeline(self):
+        return list(TimelineEntry.objects.filter(user=self.follower).values_list('post_id', flat=True))
+
+    def test_post_shared_after_an_edit_is_fanned_out(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            post = Post.objects.create(author=self.author, content='draft #django', visibility='private')
+        self.assertEqual(self.timeline(), [])
+
+        post = Post.objects.get(pk=post.pk)
+        post.visibility = 'followers'
+        with self.captureOnCommitCallbacks(execute=True):
+            post.save()
+        self.assertEqual(self.timeline(), [post.id])
+
+    def test_background_failures_are_logged(self):
+        def fan_out(post_id):
+            raise RuntimeError('boom')
+
+        # The worker's connection cleanup would close the test's own connection
+        with mock.patch.object(feed, 'connections'), self.assertLogs('apps.posts.feed', 'ERROR') as logs:
+            feed._run_in_background(fan_out, 1)
+        self.assertIn('fan_out', logs.output[0])
+
+
+class PostCounterTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = [
+            User.objects.create_user(username=f'user{i}', email=f'user{i}@example.com', password='seed-password')
+            for i in range(2)
+        ]
+        cls.post = Post.objects.create(author=cls.users[0], content='post #django', visibility='public')
+
+    def test_edit_keeps_counts_that_changed_since_the_read(self):
+        post = Post.objects.get(pk=self.post.pk)
+        Like.objects.create(user=self.users[1], post=self.post)
+
+        client = APIClient()
+        client.force_authenticate(self.users[0])
+        with mock.patch('apps.posts.views.PostViewSets.get_object', return_value=post):
+            response = client.patch(f'/api/posts/posts/{post.id}/', {'content': 'edited #django'})
+        self.assertEqual(response.status_code, 200, response.content)
+        self.post.refresh_from_db()
+        self.assertEqual((self.post.content, self.post.likes_count), ('edited #django', 1))
+
+    def test_deferred_fields_stay_deferred(self):
+        post = Post.objects.only('id', 'content').get(pk=self.post.pk)
+        post.content = 'edited #django'
+        with CaptureQueriesContext(connection) as queries:
+            post.save()
+        self.assertTrue(queries[0]['sql'].startswith('UPDATE "posts_post" SET "content" = '), queries[0]['sql'])
+        self.assertNotIn(',', queries[0]['sql'].split(' WHERE ')[0])
+
+
+@override_settings(LIKE_BUFFER_ENABLED=True)
+class LikeBufferTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = [
+            User.objects.create_user(username=f'user{i}', email=f'user{i}@example.com', password='seed-password')
+            for i in range(2)
+        ]
+        cls.post = Post.objects.create(author=cls.users[0], content='post', visibility='public')
+
+    def setUp(self):
+        # Flushes are driven by the tests, not by the worker thread
+        self.buffer = LikeBuffer()
+        patcher = mock.patch.object(LikeBuffer, '_ensure_worker')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_like_then_unlike_cancels_out(self):
+        user_id = self.users[1].id
+        self.assertTrue(self.buffer.toggle(user_id, self.post.id))
+        self.assertFalse(self.buffer.toggle(user_id, self.post.id))
+        self.assertIsNone(self.buffer.is_liked(user_id, self.post.id))
+        self.assertEqual(self.buffer.likes_delta(self.post.id), 0)
+        self.assertEqual(self.buffer.flush(), 0)
+        self.assertFalse(Like.objects.exists())
+
+    def test_concurrent_taps_toggle_twice(self):
+        user_id = self.users[1].id
+        started = threading.Barrier(2)
+
+        def slow_exists(queryset):
+            # Both taps get here together unless the buffer serializes them
+            time.sleep(0.05)
+            return False
+
+        def tap():
+            started.wait()
+            self.buffer.toggle(user_id, self.post.id)
+
+        with mock.patch.object(QuerySet, 'exists', slow_exists):
+            threads = [threading.Thread(target=tap) for _ in range(2)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        self.assertIsNone(self.buffer.is_liked(user_id, self.post.id))
+        self.assertEqual(self.buffer.likes_delta(self.post.id), 0)
+
+    def test_pending_likes_are_overlaid(self):
+        liker, other = self.users[1].id, self.users[0].id
+        self.buffer.toggle(liker, self.post.id)
+        self.assertTrue(self.buffer.is_liked(liker, self.post.id))
+        self.assertIsNone(self.buffer.is_liked(other, self.post.id))
+        self.assertEqual(self.buffer.overlay_liked(liker, [self.post.id], set()), {self.post.id})
+        self.assertEqual(self.buffer.likes_delta(self.post.id), 1)
+
+    def test_flush_writes_likes_and_counter(self):
+        for user in self.users:
+            self.buffer.toggle(user.id, self.post.id)
+        self.assertEqual(self.buffer.flush(), 2)
+        self.assertEqual(Like.objects.filter(post=self.post).count(), 2)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.likes_count, 2)
+        self.assertEqual(self.buffer.likes_delta(self.post.id), 0)
+
+        # Unlike through the buffer once the like is in the database
+        self.assertFalse(self.buffer.toggle(self.users[1].id, self.post.id))
+        self.assertEqual(self.buffer.flush(), 1)
+        self.post.refresh_from_db()
+        self.assertEqual((self.post.likes_count, Like.objects.count()), (1, 1))
+
+    def test_batch_being_written_stays_visible(self):
+        user_id = self.users[1].id
+        write, seen = self.buffer._write, []
+
+        def tap_during_write(batch):
+            seen.append((self.buffer.is_liked(user_id, self.post.id), self.buffer.likes_delta(self.post.id)))
+            seen.append(self.buffer.toggle(user_id, self.post.id))
+            write(batch)
+
+        self.buffer.toggle(user_id, self.post.id)
+        with mock.patch.object(self.buffer, '_write', tap_during_write):
+            self.buffer.flush()
+        # The second tap unliked the like that was being written
+        self.assertEqual(seen, [(True, 1), False])
+        self.assertFalse(self.buffer.is_liked(user_id, self.post.id))
+        self.assertEqual(self.buffer.flush(), 1)
+        self.assertFalse(Like.objects.exists())
+
+    def test_failed_flush_keeps_the_batch(self):
+        user_id = self.users[1].id
+        self.buffer.toggle(user_id, self.post.id)
+        with mock.patch.object(self.buffer, '_write', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                self.buffer.flush()
+        self.assertTrue(self.buffer.is_liked(user_id, self.post.id))
+        self.assertEqual(self.buffer.likes_delta(self.post.id), 1)
+        self.assertEqual(self.buffer.flush(), 1)
+        self.assertTrue(Like.objects.filter(user_id=user_id, post=self.post).exists())
+
+    def test_api_reads_its_own_buffered_like(self):
+        caches[settings.RESPONSE_CACHE_ALIAS].clear()
+        self.addCleanup(like_buffer.flush)
+        client = APIClient()
+        client.force_authenticate(self.users[1])
+        url = f'/api/posts/posts/{self.post.id}/'
+        self.assertEqual(client.post(f'{url}like/').status_code, 201)
+        body = client.get(url).json()
+        self.assertEqual((body['is_liked'], body['likes_count']), (True, 1))
+        self.assertFalse(Like.objects.exists())
 
-# Create your tests here.
@@ -1,11 +1,15 @@
 from rest_framework.routers import DefaultRouter
 from django.urls import path, include
 from .views import PostViewSets
+from . import async_views
 
 router = DefaultRouter()
 router.register(r'posts', PostViewSets, basename='post')
 
 urlpatterns = [
-    path('', include(router.urls))
+    path('', include(router.urls)),
+    # Native async reads for ASGI deployments
+    path('async/posts/', async_views.post_list, name='async_post_list'),
+    path('async/posts/<int:pk>/', async_views.post_detail, name='async_post_detail')
 ]
 
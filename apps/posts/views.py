@@ -1,9 +1,36 @@
 from rest_framework import viewsets, permissions, status
 from rest_framework.response import Response
 from .models import Post, Like
-from .serializers import PostSerializer, PostListSerializer
+from .serializers import PostSerializer, PostListSerializer, overlay_viewer_state, post_list_rows
 from rest_framework.permissions import IsAuthenticatedOrReadOnly
 from rest_framework.decorators import action
+from django.conf import settings
+from django.db import transaction
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.utils.urls import replace_query_param
+from . import feed as home_feed
+from .likes import like_buffer, liked_post_ids
+from apps.hashtags.indexing import normalize_tag
+from . import search as post_search
+from apps.core import cache as response_cache
+from apps.core.serializers import expands, wants
+from apps.users.models import User
+
+def visible_posts(user, params): # Visibility and author filter
+    queryset = Post.objects.visible_to(user)
+    # Join only what ?fields= / ?expand= will render
+    if expands(params, 'author'):
+        queryset = queryset.select_related('author__stats')
+    elif wants(params, 'author_username'):
+        queryset = queryset.select_related('author')
+    author_id = params.get('author')
+    if author_id:
+        queryset = queryset.filter(author_id=author_id)
+    tag = params.get('tag')
+    if tag:
+        # Served by the PostHashtag index instead of a LIKE scan over content
+        queryset = queryset.filter(post_hashtags__hashtag__name=normalize_tag(tag))
+    return queryset
 
 class PostViewSets(viewsets.ModelViewSet):
     queryset = Post.objects.all()
@@ -14,25 +41,158 @@ class PostViewSets(viewsets.ModelViewSet):
             return PostListSerializer
         return PostSerializer
     
+    def get_serializer(self, *args, **kwargs):
+        # Resolve is_liked for a whole page of posts with a single query
+        if (kwargs.get('many') and args and self.get_serializer_class() is PostSerializer
+                and wants(self.request.query_params, 'is_liked')):
+            posts = list(args[0])
+            context = self.get_serializer_context()
+            context['liked_post_ids'] = liked_post_ids(self.request.user, posts)
+            kwargs['context'] = context
+            args = (posts,) + args[1:]
+        return super().get_serializer(*args, **kwargs)
+
+    def list(self, request, *args, **kwargs):
+        # Rows straight from values_list(); ?expand= needs the real serializers
+        if 'expand' in request.query_params:
+            return super().list(request, *args, **kwargs)
+        return post_list_rows.list_response(self)
+
+    def retrieve(self, request, *args, **kwargs):
+        # Filtered or sparse reads skip the cache, which only holds full bodies
+        cacheable = not {'author', 'tag', 'fields', 'expand'} & request.query_params.keys()
+        pk, variant = kwargs['pk'], response_cache.request_variant(request)
+        data = response_cache.get_body('post', pk, variant) if cacheable else None
+        if data is not None:
+            user = request.user
+            own = user.is_authenticated and data['author_id'] == user.id
+            # Followers-only and private posts still go through the visibility query
+            if data['visibility'] != 'public' and not own:
+                self.get_object()
+            return Response(overlay_viewer_state(data, request.user))
+
+        # Versions are read before the rows, so a concurrent write leaves the body stale-keyed.
+        # A post's author never changes, so its id can be looked up ahead of the author's row.
+        if cacheable:
+            queryset = self.get_queryset().filter(pk=pk) if pk.isdigit() else Post.objects.none()
+            author_id = queryset.values_list('author_id', flat=True).first()
+            if author_id is None:
+                raise NotFound('No Post matches the given query.')
+            versions = response_cache.get_versions([
+                response_cache.version_key(Post, pk),
+                response_cache.version_key(User, author_id)
+            ])
+        instance = self.get_object()
+        context = dict(self.get_serializer_context(), shared=True)
+        data = PostSerializer(instance, context=context).data
+        if cacheable and pk == str(instance.pk):
+            response_cache.set_body('post', pk, data, versions, variant)
+        return Response(overlay_viewer_state(data, request.user))
+
+    # Post row and the author's UserStats change in one transaction
     def perform_create(self, serializer):
-        serializer.save(author=self.request.user)
-
-    def get_queryset(self): # Author filter
-        queryset = Post.objects.all()
-        author_id = self.request.query_params.get('author')
-        if author_id:
-            queryset = queryset.filter(author_id=author_id)
-        return queryset
+        with transaction.atomic():
+            serializer.save(author=self.request.user)
+
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            instance.delete()
+
+    def get_queryset(self):
+        return visible_posts(self.request.user, self.request.query_params)
     
     @action(detail=True, methods=['post'], permission_classes=[permissions.IsAuthenticated])
     def like(self, request, pk=None):
         post = self.get_object()
         user = request.user
 
-        like, created = Like.objects.get_or_create(user=user, post=post)
+        # Buffered mode: record the intent, the like buffer writes it in the next batch
+        if like_buffer.enabled:
+            if like_buffer.toggle(user.id, post.id):
+                return Response({'status': 'liked'}, status=status.HTTP_201_CREATED)
+            return Response({'status': 'unliked'}, status=status.HTTP_200_OK)
+
+        # Like row and Post.likes_count change in one transaction
+        with transaction.atomic():
+            like, created = Like.objects.get_or_create(user=user, post=post)
+            if not created:
+                like.delete()
 
         if not created:
-            like.delete()
             return Response({'status': 'unliked'}, status=status.HTTP_200_OK)
         
-        return Response({'status': 'liked'}, status=status.HTTP_201_CREATED)
\ No newline at end of file
+        return Response({'status': 'liked'}, status=status.HTTP_201_CREATED)
+
+    @action(detail=False, methods=['get', 'post'])
+    def bulk(self, request):
+        limit = getattr(settings, 'POST_BULK_MAX_ITEMS', 100)
+        if request.method == 'POST':
+            serializer = self.get_serializer(data=request.data, many=True, max_length=limit)
+            serializer.is_valid(raise_exception=True)
+            with transaction.atomic():
+                posts = serializer.save()
+            return Response(self.get_serializer(posts, many=True).data, status=status.HTTP_201_CREATED)
+
+        try:
+            ids = list(dict.fromkeys(int(value) for value in request.query_params.get('ids', '').split(',') if value))
+        except ValueError:
+            raise ValidationError({'ids': 'A comma-separated list of post ids is required.'})
+        if not ids:
+            raise ValidationError({'ids': 'A comma-separated list of post ids is required.'})
+        if len(ids) > limit:
+            raise ValidationError({'ids': f'At most {limit} ids per request.'})
+        # One query for the posts, one for is_liked; missing or hidden posts are left out
+        posts = self.get_queryset().in_bulk(ids)
+        serializer = self.get_serializer([posts[pk] for pk in ids if pk in posts], many=True)
+        return Response({'results': serializer.data})
+
+    @action(detail=False, methods=['get'], permission_classes=[permissions.IsAuthenticated])
+    def feed(self, request):
+        position = None
+        before = request.query_params.get('before')
+        if before:
+            position = home_feed.decode_position(before)
+            if position is None:
+                raise ValidationError({'before': 'Invalid cursor.'})
+
+        posts = home_feed.get_feed(request.user, position=position)
+        serializer = self.get_serializer(posts, many=True)
+
+        next_url = None
+        if len(posts) == home_feed.page_size():
+            next_url = request.build_absolute_uri(
+                f'{request.path}?before={home_feed.encode_position(posts[-1])}'
+            )
+        return Response({'next': next_url, 'results': serializer.data})
+
+    @action(detail=False, methods=['get'])
+    def search(self, request):
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            raise ValidationError({'q': 'A search query is required.'})
+        queryset = self.get_queryset()
+
+        if not post_search.is_supported():
+            page = self.paginate_queryset(queryset.filter(content__icontains=query))
+            return self.get_paginated_response(self.get_serializer(page, many=True).data)
+
+        # BM25-ranked FTS5 match, paginated by (score, id)
+        after = None
+        cursor = request.query_params.get('cursor')
+        if cursor:
+            after = post_search.decode_cursor(cursor)
+            if after is None:
+                raise NotFound('Invalid cursor')
+        page_size = self.paginator.get_page_size(request)
+        rows = post_search.search_posts(queryset, query, after=after, limit=page_size)
+        posts = [post for post, _ in post_search.load_ranked(rows[:page_size], queryset)]
+
+        next_url = None
+        if len(rows) > page_size:
+            post_id, score = rows[page_size - 1]
+            next_url = replace_query_param(
+                request.build_absolute_uri(), 'cursor', post_search.encode_cursor(score, post_id)
+            )
+        serializer = self.get_serializer(posts, many=True)
+        return Response({'next': next_url, 'previous': None, 'results': serializer.data})
+
@@ -0,0 +1,92 @@
+import json
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import update_last_login
+from django.http import JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
+from rest_framework_simplejwt.settings import api_settings
+from apps.core import hashing
+from apps.core.async_api import async_api_view
+from .models import User
+from .serializers import UserSerializer, PublicUserSerializer, ClaimsTokenObtainPairSerializer
+
+# Login and registration for ASGI: password hashing runs in apps.core.hashing's
+# process pool, so a login spike doesn't hold the event loop for ~100ms per request.
+
+INVALID_CREDENTIALS = 'No active account found with the given credentials'
+
+
+def _payload(request):
+    # (data, None), or (None, the 400 to return)
+    if request.content_type == 'application/json':
+        try:
+            data = json.loads(request.body or b'{}')
+        except ValueError:
+            return None, JsonResponse({'detail': 'JSON parse error.'}, status=400)
+        if not isinstance(data, dict):
+            detail = f'Invalid data. Expected a dictionary, but got {type(data).__name__}.'
+            return None, JsonResponse({'non_field_errors': [detail]}, status=400)
+        return data, None
+    data = request.POST.copy()
+    data.update(request.FILES)
+    return data, None
+
+
+@csrf_exempt
+@require_POST
+async def login(request):
+    data, error = _payload(request)
+    if error is not None:
+        return error
+    username, password = data.get('username'), data.get('password')
+    errors = {field: ['This field is required.'] for field in ('username', 'password') if not data.get(field)}
+    errors.update({
+        field: ['Not a valid string.'] for field in ('username', 'password')
+        if field not in errors and not isinstance(data[field], str)
+    })
+    if errors:
+        return JsonResponse(errors, status=400)
+
+    user = await User.objects.filter(username=username).afirst()
+    if user is None:
+        # Same cost as a real check so response time doesn't reveal which usernames exist
+        await hashing.make_password(password)
+        return JsonResponse({'detail': INVALID_CREDENTIALS}, status=401)
+    matches, upgraded = await hashing.check_password(password, user.password)
+    if not matches or not user.is_active:
+        return JsonResponse({'detail': INVALID_CREDENTIALS}, status=401)
+    if upgraded:
+        user.password = upgraded
+        await user.asave(update_fields=['password'])
+
+    refresh = ClaimsTokenObtainPairSerializer.get_token(user)
+    if api_settings.UPDATE_LAST_LOGIN:
+        await sync_to_async(update_last_login)(None, user)
+    return JsonResponse({'refresh': str(refresh), 'access': str(refresh.access_token)})
+
+
+@csrf_exempt
+@require_POST
+async def register(request):
+    data, error = _payload(request)
+    if error is not None:
+        return error
+    serializer = UserSerializer(data=data, context={'request': request})
+    if not await sync_to_async(serializer.is_valid)():
+        return JsonResponse(serializer.errors, status=400)
+
+    encoded = await hashing.make_password(serializer.validated_data['password'])
+
+    def save():
+        serializer.save(password_hash=encoded)
+        return serializer.data
+
+    return JsonResponse(await sync_to_async(save)(), status=201)
+
+
+@async_api_view(authenticated=True)
+async def me(request):
+    # Async UserViewSet.me: request.user only carries the authentication fields
+    user = await User.objects.select_related('stats').aget(pk=request.user.pk)
+    return PublicUserSerializer(user, context={'request': request}).data
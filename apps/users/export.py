@@ -0,0 +1,67 @@
+import orjson
+from django.conf import settings
+from django.db.models import F
+from apps.comments.models import Comment
+from apps.posts.models import Post, Like
+from .models import User, Relationship
+
+# Account export for data-portability requests: one JSON object per line, each
+# with a "type". Rows come from values() querysets read with iterator(), so
+# memory stays flat however many posts, comments or likes the account has.
+
+
+def sections(user_id):
+    return [
+        ('account', User.objects.filter(pk=user_id).values(
+            'id', 'username', 'email', 'first_name', 'last_name', 'role', 'avatar', 'date_joined',
+            bio=F('profile__bio'), github=F('profile__github'), birth_date=F('profile__birth_date')
+        )),
+        ('post', Post.objects.filter(author_id=user_id).order_by('pk').values(
+            'id', 'content', 'image', 'visibility', 'created_at', 'updated_at'
+        )),
+        ('comment', Comment.objects.filter(author_id=user_id).order_by('pk').values(
+            'id', 'post_id', 'parent_id', 'content', 'created_at', 'updated_at'
+        )),
+        ('like', Like.objects.filter(user_id=user_id).order_by('pk').values(
+            'post_id', 'created_at'
+        )),
+        ('following', Relationship.objects.filter(from_user_id=user_id).order_by('pk').values(
+            'created_at', user_id=F('to_user_id'), username=F('to_user__username')
+        )),
+        ('follower', Relationship.objects.filter(to_user_id=user_id).order_by('pk').values(
+            'created_at', user_id=F('from_user_id'), username=F('from_user__username')
+        )),
+    ]
+
+
+def _line(kind, row):
+    return orjson.dumps({'type': kind, **row}, option=orjson.OPT_UTC_Z) + b'\n'
+
+
+def export_lines(user_id, chunk_size=None):
+    """NDJSON for ``user_id``'s account, one bytes chunk per ``chunk_size`` rows."""
+    chunk_size = chunk_size or settings.ACCOUNT_EXPORT_CHUNK_SIZE
+    for kind, queryset in sections(user_id):
+        buffer = []
+        for row in queryset.iterator(chunk_size=chunk_size):
+            buffer.append(_line(kind, row))
+            if len(buffer) >= chunk_size:
+                yield b''.join(buffer)
+                buffer = []
+        # Flushed per section too, so the account line goes out before the first big query
+        if buffer:
+            yield b''.join(buffer)
+
+
+async def aexport_lines(user_id, chunk_size=None):
+    # export_lines for ASGI, which would otherwise read a sync iterator to the end before sending
+    chunk_size = chunk_size or settings.ACCOUNT_EXPORT_CHUNK_SIZE
+    for kind, queryset in sections(user_id):
+        buffer = []
+        async for row in queryset.aiterator(chunk_size=chunk_size):
+            buffer.append(_line(kind, row))
+            if len(buffer) >= chunk_size:
+                yield b''.join(buffer)
+                buffer = []
+        if buffer:
+            yield b''.join(buffer)
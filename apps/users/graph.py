@@ -0,0 +1,184 @@
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from collections import OrderedDict
+
+from django.conf import settings
+
+from apps.core import metrics
+from .models import Relationship
+
+FOLLOWING = 'following'
+FOLLOWERS = 'followers'
+
+
+def _contains(ids, value):
+    i = bisect_left(ids, value)
+    return i < len(ids) and ids[i] == value
+
+
+def intersect(left, right):
+    # Merge of two sorted id arrays
+    result = []
+    i = j = 0
+    while i < len(left) and j < len(right):
+        if left[i] < right[j]:
+            i += 1
+        elif left[i] > right[j]:
+            j += 1
+        else:
+            result.append(left[i])
+            i += 1
+            j += 1
+    return result
+
+
+def related_ids(kind, user_id):
+    # Sorted straight off the (from_user, to_user) and (to_user, from_user) indexes
+    if kind == FOLLOWING:
+        return Relationship.objects.filter(from_user_id=user_id).order_by('to_user_id').values_list('to_user_id', flat=True)
+    return Relationship.objects.filter(to_user_id=user_id).order_by('from_user_id').values_list('from_user_id', flat=True)
+
+
+class FollowGraph:
+    """
+    Process-local index of the follow graph.
+
+    Each user's following and follower ids are kept as a sorted ``array('q')``
+    loaded from Relationship on first use. Entries are evicted least recently
+    used once the index holds more than ``max_ids`` ids in total, and reloaded
+    after ``ttl`` seconds so writes made by other processes show up.
+    Arrays are replaced, never mutated, so readers may keep the one they got.
+    A load that overlaps a write to the same key is used once but not cached,
+    since its rows may predate the write.
+
+    Answers can lag another process by up to ``ttl``, so the index is for
+    ranking and batching reads; access checks query Relationship.
+    """
+
+    def __init__(self, max_ids=2_000_000, ttl=300):
+        self.max_ids = max_ids
+        self.ttl = ttl
+        self._entries = OrderedDict()  # (kind, user_id) -> (ids, loaded_at)
+        self._size = 0
+        self._loads = {}  # key -> (loads in flight, writes seen since the first began)
+        self._lock = threading.Lock()
+
+    def _query(self, kind, user_id):
+        return array('q', related_ids(kind, user_id))
+
+    def _cached(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if time.monotonic() - entry[1] > self.ttl:
+                self._discard(key)
+                return None
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def _discard(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._size -= len(entry[0])
+
+    def _begin_load(self, key):
+        with self._lock:
+            loads, writes = self._loads.get(key, (0, 0))
+            self._loads[key] = (loads + 1, writes)
+            return writes
+
+    def _end_load(self, key):
+        # Caller holds _lock; returns the writes seen while loads of key were in flight
+        loads, writes = self._loads.pop(key)
+        if loads > 1:
+            self._loads[key] = (loads - 1, writes)
+        return writes
+
+    def _store(self, key, ids, writes):
+        with self._lock:
+            if self._end_load(key) != writes:
+                return
+            self._discard(key)
+            self._entries[key] = (ids, time.monotonic())
+            self._size += len(ids)
+            while self._size > self.max_ids and len(self._entries) > 1:
+                self._discard(next(iter(self._entries)))
+
+    def _get(self, kind, user_id):
+        key = (kind, user_id)
+        ids = self._cached(key)
+        metrics.cache_lookup('follow_graph', ids is not None)
+        if ids is None:
+            # Loaded outside the lock; _store drops the result if a write landed meanwhile
+            writes = self._begin_load(key)
+            try:
+                ids = self._query(kind, user_id)
+            except BaseException:
+                with self._lock:
+                    self._end_load(key)
+                raise
+            self._store(key, ids, writes)
+        return ids
+
+    def following(self, user_id):
+        return self._get(FOLLOWING, user_id)
+
+    def followers(self, user_id):
+        return self._get(FOLLOWERS, user_id)
+
+    def follows(self, follower_id, followee_id):
+        # Prefer whichever side is already resident
+        ids = self._cached((FOLLOWERS, followee_id))
+        if ids is not None:
+            return _contains(ids, follower_id)
+        return _contains(self.following(follower_id), followee_id)
+
+    def common_following(self, user_id, other_id):
+        return intersect(self.following(user_id), self.following(other_id))
+
+    def common_followers(self, user_id, other_id):
+        return intersect(self.followers(user_id), self.followers(other_id))
+
+    def _update(self, key, value, add):
+        with self._lock:
+            if key in self._loads:
+                loads, writes = self._loads[key]
+                self._loads[key] = (loads, writes + 1)
+            entry = self._entries.get(key)
+            if entry is None:
+                return
+            ids, loaded_at = entry
+            i = bisect_left(ids, value)
+            present = i < len(ids) and ids[i] == value
+            if add == present:
+                return
+            updated = array('q', ids)
+            if add:
+                updated.insert(i, value)
+                self._size += 1
+            else:
+                del updated[i]
+                self._size -= 1
+            self._entries[key] = (updated, loaded_at)
+
+    def add_edge(self, follower_id, followee_id):
+        self._update((FOLLOWING, follower_id), followee_id, True)
+        self._update((FOLLOWERS, followee_id), follower_id, True)
+
+    def remove_edge(self, follower_id, followee_id):
+        self._update((FOLLOWING, follower_id), followee_id, False)
+        self._update((FOLLOWERS, followee_id), follower_id, False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+
+follow_graph = FollowGraph(
+    max_ids=getattr(settings, 'FOLLOW_GRAPH_MAX_IDS', 2_000_000),
+    ttl=getattr(settings, 'FOLLOW_GRAPH_TTL', 300)
+)
@@ -0,0 +1,34 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+from apps.users.export import export_lines
+from apps.users.models import User
+
+
+class Command(BaseCommand):
+    help = "Write a user's account export (posts, comments, likes, follows) as NDJSON."
+
+    def add_arguments(self, parser):
+        parser.add_argument('user', help='Username or id')
+        parser.add_argument('--output', '-o', help='File to write to (default: stdout)')
+        parser.add_argument('--chunk-size', type=int, default=None)
+
+    def handle(self, *args, **options):
+        value = options['user']
+        lookup = {'pk': int(value)} if value.isdigit() else {'username': value}
+        user_id = User.objects.filter(**lookup).values_list('pk', flat=True).first()
+        if user_id is None:
+            raise CommandError(f'No user matches {value!r}.')
+
+        out = open(options['output'], 'wb') if options['output'] else sys.stdout.buffer
+        written = 0
+        try:
+            for chunk in export_lines(user_id, options['chunk_size']):
+                out.write(chunk)
+                written += chunk.count(b'\n')
+            out.flush()
+        finally:
+            if options['output']:
+                out.close()
+        if options['output']:
+            self.stdout.write(self.style.SUCCESS(f'Wrote {written} records to {options["output"]}.'))
@@ -0,0 +1,58 @@
+# Generated by Django 5.2.4 on 2026-10-18 00:50
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_stats(apps, schema_editor):
+    User = apps.get_model('users', 'User')
+    UserStats = apps.get_model('users', 'UserStats')
+    Relationship = apps.get_model('users', 'Relationship')
+    Post = apps.get_model('posts', 'Post')
+
+    def count_of(model, field):
+        rows = model.objects.filter(**{field: OuterRef('pk')}).order_by().values(field).annotate(n=Count('*')).values('n')
+        return Coalesce(Subquery(rows, output_field=IntegerField()), 0)
+
+    users = User.objects.annotate(
+        n_posts=count_of(Post, 'author'),
+        n_followers=count_of(Relationship, 'to_user'),
+        n_following=count_of(Relationship, 'from_user'),
+    ).only('id')
+    batch = []
+    for user in users.iterator(chunk_size=2000):
+        batch.append(UserStats(
+            user_id=user.id,
+            post_count=user.n_posts,
+            follower_count=user.n_followers,
+            following_count=user.n_following,
+        ))
+        if len(batch) >= 2000:
+            UserStats.objects.bulk_create(batch, ignore_conflicts=True)
+            batch = []
+    if batch:
+        UserStats.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0004_profile_created_at'),
+        ('posts', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserStats',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('post_count', models.PositiveIntegerField(default=0, verbose_name='Posts')),
+                ('follower_count', models.PositiveIntegerField(default=0, verbose_name='Followers')),
+                ('following_count', models.PositiveIntegerField(default=0, verbose_name='Following')),
+            ],
+        ),
+        migrations.RunPython(backfill_stats, migrations.RunPython.noop),
+    ]
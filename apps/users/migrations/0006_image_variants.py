@@ -0,0 +1,24 @@
+# Generated by Django 5.2.4 on 2026-10-18 00:55
+
+import apps.core.images
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0005_userstats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='avatar_variants',
+            field=models.JSONField(blank=True, default=dict, editable=False, verbose_name='Profile Picture Variants'),
+        ),
+        migrations.AlterField(
+            model_name='user',
+            name='avatar',
+            field=models.ImageField(blank=True, help_text='Optional', null=True, storage=apps.core.images.image_storage, upload_to=apps.core.images.avatar_path, verbose_name='Profile Picture'),
+        ),
+    ]
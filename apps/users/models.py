@@ -1,6 +1,7 @@
 from django.db import models
 from django.contrib.auth.models import AbstractUser
 from django.core.exceptions import ValidationError
+from apps.core.images import image_storage, avatar_path
 
 class User(AbstractUser):
 
@@ -18,14 +19,28 @@ class User(AbstractUser):
 
     avatar = models.ImageField(
         'Profile Picture',
-        upload_to='profile_pics/',
+        upload_to=avatar_path,
+        storage=image_storage,
         null=True,
         blank=True,
         help_text='Optional'
     )
 
+    avatar_variants = models.JSONField(
+        'Profile Picture Variants',
+        default=dict,
+        blank=True,
+        editable=False
+    )
+
     USERNAME_FIELD = 'username'
     REQUIRED_FIELDS = ['first_name', 'last_name', 'email']
+
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            # Keyset pages of the user list
+            models.Index(fields=['-date_joined', '-id'])
+        ]
         
     def clean(self):
         if self.avatar and self.avatar.size > 2 * 1024 * 1024:
@@ -119,6 +134,10 @@ class Relationship(models.Model):
     )
     class Meta:
         unique_together = (('from_user', 'to_user'),)
+        indexes = [
+            # Followers of a user in id order, read without touching the table
+            models.Index(fields=['to_user', 'from_user'])
+        ]
 
     def clean(self):
         if self.from_user == self.to_user:
@@ -129,6 +148,33 @@ class Relationship(models.Model):
     def __str__(self):
         return f"{self.from_user} follows {self.to_user}."
         
+class UserStats(models.Model):
+    # One row per user, updated incrementally by signals on Post and Relationship
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats'
+    )
+
+    post_count = models.PositiveIntegerField(
+        'Posts',
+        default=0
+    )
+
+    follower_count = models.PositiveIntegerField(
+        'Followers',
+        default=0
+    )
+
+    following_count = models.PositiveIntegerField(
+        'Following',
+        default=0
+    )
+
+    def __str__(self):
+        return f"Stats for {self.user}"
+
 class EmailVerificationToken(models.Model):
     user = models.ForeignKey(
         User,
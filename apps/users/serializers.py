@@ -1,8 +1,15 @@
 from rest_framework import serializers
 from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
 from .models import User, Profile, Relationship, EmailVerificationToken
 from datetime import date, timedelta
 from django.contrib.auth import authenticate, get_user_model
+from apps.core.images import variant_urls
+from apps.core.authentication import add_user_claims
+from apps.core.rows import ValuesRowSerializer, default_column, file_column
+from apps.core.serializers import SparseFieldsMixin
 
 class UserSerializer(serializers.ModelSerializer):
     password2 = serializers.CharField(
@@ -69,15 +76,22 @@ class UserSerializer(serializers.ModelSerializer):
     def create(self, validated_data):
         password = validated_data.pop('password')
         validated_data.pop('password2')
+        # Already hashed off the request thread by the async registration view
+        password_hash = validated_data.pop('password_hash', None)
         user = User.objects.create(**validated_data)
-        user.set_password(password)
+        if password_hash:
+            user.password = password_hash
+        else:
+            user.set_password(password)
         user.save()
         return user
 
-class PublicUserSerializer(serializers.ModelSerializer):
-    post_count = serializers.SerializerMethodField()
-    follower_count = serializers.SerializerMethodField()
-    following_count = serializers.SerializerMethodField()
+class PublicUserSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    # Read from UserStats; querysets should select_related('stats')
+    post_count = serializers.IntegerField(source='stats.post_count', read_only=True, default=0)
+    follower_count = serializers.IntegerField(source='stats.follower_count', read_only=True, default=0)
+    following_count = serializers.IntegerField(source='stats.following_count', read_only=True, default=0)
+    avatar_variants = serializers.SerializerMethodField()
     class Meta:    
         model = User
         fields = [
@@ -86,24 +100,20 @@ class PublicUserSerializer(serializers.ModelSerializer):
             'first_name',
             'last_name',
             'avatar',
+            'avatar_variants',
             'date_joined',
             'post_count',
             'follower_count',
             'following_count'
         ]
-        read_only_fields = ['id', 'date_joined', 'post_count', 'follower_count', 'following_count']
+        read_only_fields = ['id', 'date_joined', 'post_count', 'follower_count', 'following_count', 'avatar_variants']
+        expandable_fields = {'profile': ('apps.users.serializers.ProfileSerializer', {})}
 
-    def get_post_count(self, obj):
-        return obj.posts.count()
-    
-    def get_follower_count(self, obj):
-        return obj.followers.count()
-    
-    def get_following_count(self, obj):
-        return obj.following.count()
-    
-class UserListSerializer(serializers.ModelSerializer):
-    post_count = serializers.IntegerField(source='posts.count', read_only=True)
+    def get_avatar_variants(self, obj):
+        return variant_urls(obj.avatar, obj.avatar_variants, self.context.get('request'))
+
+class UserListSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    post_count = serializers.IntegerField(source='stats.post_count', read_only=True, default=0)
     class Meta:
         model = User
         fields = [
@@ -115,6 +125,16 @@ class UserListSerializer(serializers.ModelSerializer):
             'post_count'
         ]
         read_only_fields = ['id', 'post_count']
+
+# UserListSerializer's output, built from values_list() rows (UserViewSet.list)
+user_list_rows = ValuesRowSerializer(
+    id='pk',
+    username='username',
+    first_name='first_name',
+    last_name='last_name',
+    avatar=('avatar', file_column(User, 'avatar')),
+    post_count=('stats__post_count', default_column(0))
+)
     
 class PasswordChangeSerializer(serializers.Serializer):
     current_password = serializers.CharField(
@@ -204,7 +224,7 @@ class LoginSerializer(serializers.Serializer):
             raise serializers.ValidationError("User account is disabled.", code='authorization')
         
         # Generating Tokens
-        refresh = RefreshToken.for_user(user)
+        refresh = add_user_claims(RefreshToken.for_user(user), user)
         attrs['refresh'] = str(refresh)
         attrs['access'] = str(refresh.access_token)
         # Serializing public data of user
@@ -212,6 +232,24 @@ class LoginSerializer(serializers.Serializer):
 
         return attrs
     
+class ClaimsTokenObtainPairSerializer(TokenObtainPairSerializer):
+    # Lets CachedJWTAuthentication run statelessly off the token (JWT_AUTH_STATELESS)
+    @classmethod
+    def get_token(cls, user):
+        return add_user_claims(super().get_token(user), user)
+
+class ClaimsTokenRefreshSerializer(TokenRefreshSerializer):
+    # Claims are re-read on refresh, so a stateless token is never staler than ACCESS_TOKEN_LIFETIME
+    def validate(self, attrs):
+        refresh = self.token_class(attrs['refresh'])
+        user = User.objects.filter(
+            **{api_settings.USER_ID_FIELD: refresh.payload.get(api_settings.USER_ID_CLAIM)}
+        ).first()
+        if user is None or not api_settings.USER_AUTHENTICATION_RULE(user):
+            raise AuthenticationFailed(self.error_messages['no_active_account'], 'no_active_account')
+        attrs['refresh'] = str(add_user_claims(refresh, user))
+        return super().validate(attrs)
+
 class ProfileSerializer(serializers.ModelSerializer):
     class Meta:    
         model = Profile
@@ -0,0 +1,49 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .models import User, Relationship, UserStats
+from .graph import follow_graph
+from apps.core.images import schedule_variants
+from apps.core import cache as response_cache
+from apps.core.authentication import user_cache
+from . import stats
+
+@receiver(post_save, sender=User)
+def create_user_stats(sender, instance, created, **kwargs):
+    if created:
+        UserStats.objects.get_or_create(user=instance)
+
+@receiver(post_save, sender=Relationship)
+def count_follow(sender, instance, created, **kwargs):
+    if created:
+        stats.increment(instance.from_user_id, following_count=1)
+        stats.increment(instance.to_user_id, follower_count=1)
+
+@receiver(post_delete, sender=Relationship)
+def count_unfollow(sender, instance, **kwargs):
+    stats.decrement(instance.from_user_id, following_count=1)
+    stats.decrement(instance.to_user_id, follower_count=1)
+
+@receiver(post_save, sender=Relationship)
+def index_follow(sender, instance, created, **kwargs):
+    if created:
+        transaction.on_commit(lambda: follow_graph.add_edge(instance.from_user_id, instance.to_user_id))
+
+@receiver(post_delete, sender=Relationship)
+def index_unfollow(sender, instance, **kwargs):
+    transaction.on_commit(lambda: follow_graph.remove_edge(instance.from_user_id, instance.to_user_id))
+
+@receiver(post_save, sender=User)
+def process_avatar(sender, instance, **kwargs):
+    schedule_variants(instance, 'avatar', 'avatar_variants')
+
+# Cached detail bodies (apps.core.cache); UserStats bumps its own version in stats.py
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_cached_user(sender, instance, **kwargs):
+    response_cache.bump_on_commit(User, instance.pk)
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_cached_auth_user(sender, instance, **kwargs):
+    transaction.on_commit(lambda: user_cache.invalidate(instance.pk))
@@ -0,0 +1,21 @@
+from django.db.models import F
+from django.db.models.functions import Greatest
+from apps.core import cache as response_cache
+from .models import UserStats
+
+
+def _deltas(deltas):
+    return {field: Greatest(F(field) + delta, 0) for field, delta in deltas.items()}
+
+
+def increment(user_id, **deltas):
+    if not UserStats.objects.filter(user_id=user_id).update(**_deltas(deltas)):
+        UserStats.objects.get_or_create(user_id=user_id)
+        UserStats.objects.filter(user_id=user_id).update(**_deltas(deltas))
+    response_cache.bump_on_commit(UserStats, user_id)
+
+
+def decrement(user_id, **deltas):
+    # Never creates a row: the user may be in the middle of being deleted
+    UserStats.objects.filter(user_id=user_id).update(**_deltas({f: -d for f, d in deltas.items()}))
+    response_cache.bump_on_commit(UserStats, user_id)
@@ -1,3 +1,276 @@
-from django.test import TestCase
+from unittest import mock
+
+from django.contrib.auth.hashers import PBKDF2PasswordHasher, check_password
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.tokens import AccessToken
+from apps.core import hashing
+from apps.core.authentication import CachedJWTAuthentication, user_cache
+from apps.core.testing import SeededAPITestCase
+from .graph import FOLLOWING, FollowGraph, follow_graph
+from .models import Relationship, User, UserStats
+from .serializers import ClaimsTokenObtainPairSerializer
+
+
+class UserQueryCountTests(SeededAPITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.admin = User.objects.create_user(
+            username='admin', email='admin@example.com', password='seed-password', is_staff=True
+        )
+        cls.user = User.objects.get(pk=UserStats.objects.order_by('-follower_count').values('user_id')[:1])
+
+    def test_list(self):
+        self.assertMaxQueries(1, '/api/users/users/', self.admin)
+        self.assertMaxQueries(1, '/api/users/users/?fields=id,username', self.admin)
+        self.assertQueriesConstant('/api/users/users/', self.admin)
+
+    def test_retrieve(self):
+        url = f'/api/users/users/{self.user.id}/'
+        self.assertMaxQueries(1, url, self.user)
+        # Cached body; the owner check needs no query
+        self.assertMaxQueries(0, url, self.user)
+        self.assertMaxQueries(1, f'{url}?expand=profile', self.user)
+
+    def test_me(self):
+        self.assertMaxQueries(1, '/api/users/users/me/', self.user)
+        self.assertMaxQueries(1, '/api/users/async/users/me/', self.user)
+
+    def test_token_authentication_is_cached(self):
+        header = f'Bearer {AccessToken.for_user(self.user)}'
+        url = '/api/posts/posts/?fields=id'
+        # The first request loads the user, later ones reuse it
+        self.assertMaxQueries(4, url, HTTP_AUTHORIZATION=header)
+        self.assertMaxQueries(3, url, HTTP_AUTHORIZATION=header)
+
+    def test_export(self):
+        self.client.force_authenticate(self.user)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/users/users/me/export/')
+            lines = b''.join(response.streaming_content).splitlines()
+        self.assertEqual(response.status_code, 200)
+        self.assertGreater(len(lines), 1)
+        # One query per section, however many rows each has
+        self.assertLessEqual(len(queries), 6)
+
+
+class AsyncAuthTests(TestCase):
+    # Runs with PASSWORD_HASH_OFFLOAD on, so hashing goes through the process pool and semaphore
+    login_url = '/api/users/auth/async/login/'
+    register_url = '/api/users/auth/async/register/'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='alice', email='alice@example.com', password='seed-password')
+
+    async def login(self, username, password):
+        return await self.async_client.post(
+            self.login_url, {'username': username, 'password': password}, content_type='application/json'
+        )
+
+    async def test_login(self):
+        response = await self.login('alice', 'seed-password')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(AccessToken(response.json()['access'])['user_id'], str(self.user.pk))
+        self.assertIsNotNone(hashing._pool)
+
+    async def test_login_rejects_bad_password_and_unknown_user(self):
+        for username, password in (('alice', 'wrong-password'), ('nobody', 'seed-password')):
+            response = await self.login(username, password)
+            self.assertEqual(response.status_code, 401)
+            self.assertNotIn('access', response.json())
+
+    async def test_login_saves_upgraded_hash(self):
+        hasher = PBKDF2PasswordHasher()
+        self.user.password = hasher.encode('seed-password', hasher.salt(), iterations=1000)
+        await self.user.asave(update_fields=['password'])
+
+        response = await self.login('alice', 'seed-password')
+        self.assertEqual(response.status_code, 200)
+        await self.user.arefresh_from_db(fields=['password'])
+        self.assertFalse(hasher.must_update(self.user.password))
+        self.assertTrue(check_password('seed-password', self.user.password))
+
+    async def test_register(self):
+        response = await self.async_client.post(self.register_url, {
+            'username': 'bobby',
+            'email': 'bob@example.com',
+            'password': 'Long-passw0rd!',
+            'password2': 'Long-passw0rd!'
+        }, content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+        self.assertNotIn('password', response.json())
+        user = await User.objects.aget(username='bobby')
+        self.assertTrue(check_password('Long-passw0rd!', user.password))
+
+    async def test_login_fields_must_be_strings(self):
+        for username, password in (('nobody', 123), (['alice'], 'seed-password'), ('alice', {'a': 1})):
+            response = await self.login(username, password)
+            self.assertEqual(response.status_code, 400, (username, password))
+
+    async def test_body_must_be_an_object(self):
+        for url in (self.login_url, self.register_url):
+            for body in ('[1, 2]', '"alice"', '{'):
+                response = await self.async_client.post(url, body, content_type='application/json')
+                self.assertEqual(response.status_code, 400, (url, body))
+
+
+class TokenUserTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='alice', email='alice@example.com', password='seed-password', is_staff=True
+        )
+
+    def setUp(self):
+        user_cache.clear()
+
+    def authenticate(self, token):
+        return CachedJWTAuthentication().get_user(AccessToken(str(token)))
+
+    def update(self, **fields):
+        for field, value in fields.items():
+            setattr(self.user, field, value)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.save()
+
+    def refresh(self, token):
+        return self.client.post('/api/users/auth/refresh', {'refresh': str(token)})
+
+    def test_cached_user_is_dropped_on_save(self):
+        token = AccessToken.for_user(self.user)
+        with self.assertNumQueries(1):
+            self.authenticate(token)
+        with self.assertNumQueries(0):
+            self.assertTrue(self.authenticate(token).is_staff)
+
+        self.update(is_staff=False)
+        self.assertIsNone(user_cache.get(self.user.pk))
+        self.assertFalse(self.authenticate(token).is_staff)
+        self.update(is_active=False)
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate(token)
+
+    @override_settings(JWT_AUTH_STATELESS=True)
+    def test_stateless_reads_the_claims(self):
+        refresh = ClaimsTokenObtainPairSerializer.get_token(self.user)
+        with self.assertNumQueries(0):
+            user = self.authenticate(refresh.access_token)
+        self.assertEqual((user.pk, user.username, user.is_staff), (self.user.pk, 'alice', True))
+        # Tokens without the claims fall back to the cache
+        with self.assertNumQueries(1):
+            self.authenticate(AccessToken.for_user(self.user))
+
+    @override_settings(JWT_AUTH_STATELESS=True)
+    def test_refresh_rereads_the_claims(self):
+        refresh = ClaimsTokenObtainPairSerializer.get_token(self.user)
+        self.update(is_staff=False, username='alice2')
+
+        response = self.refresh(refresh)
+        self.assertEqual(response.status_code, 200)
+        user = self.authenticate(response.json()['access'])
+        self.assertEqual((user.username, user.is_staff), ('alice2', False))
+        # The rotated refresh token carries them too
+        rotated = ClaimsTokenObtainPairSerializer.token_class(response.json()['refresh'])
+        self.assertFalse(rotated['is_staff'])
+
+        self.update(is_active=False)
+        self.assertEqual(self.refresh(rotated).status_code, 401)
+
+
+class FollowGraphTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = [
+            User.objects.create_user(username=f'user{i}', email=f'user{i}@example.com', password='seed-password')
+            for i in range(4)
+        ]
+        a, b, c, d = (user.id for user in cls.users)
+        Relationship.objects.bulk_create([
+            Relationship(from_user_id=a, to_user_id=c),
+            Relationship(from_user_id=a, to_user_id=d),
+            Relationship(from_user_id=b, to_user_id=c),
+            Relationship(from_user_id=b, to_user_id=d),
+            Relationship(from_user_id=c, to_user_id=a),
+        ])
+
+    def setUp(self):
+        self.graph = FollowGraph()
+        self.ids = [user.id for user in self.users]
+
+    def test_follows(self):
+        a, b, c, d = self.ids
+        self.assertTrue(self.graph.follows(a, c))
+        self.assertFalse(self.graph.follows(c, d))
+        self.assertEqual(list(self.graph.followers(c)), [a, b])
+
+    def test_intersections(self):
+        a, b, c, d = self.ids
+        self.assertEqual(self.graph.common_following(a, b), [c, d])
+        self.assertEqual(self.graph.common_followers(c, d), [a, b])
+        self.assertEqual(self.graph.common_following(a, c), [])
+
+    def test_writes_patch_resident_entries(self):
+        a, b, c, d = self.ids
+        self.graph.following(c)
+        with self.assertNumQueries(0):
+            self.graph.add_edge(c, d)
+            self.assertTrue(self.graph.follows(c, d))
+            self.graph.remove_edge(c, a)
+            self.assertFalse(self.graph.follows(c, a))
+
+    def test_least_recently_used_entries_are_evicted(self):
+        a, b, c, d = self.ids
+        self.graph.max_ids = 4
+        self.graph.following(a)
+        self.graph.following(b)
+        self.graph.following(a)
+        self.graph.followers(c)
+        # b's two ids went first; a was used more recently
+        self.assertIsNone(self.graph._cached((FOLLOWING, b)))
+        self.assertIsNotNone(self.graph._cached((FOLLOWING, a)))
+        self.assertEqual(self.graph._size, 4)
+
+    def test_write_during_load_is_not_lost(self):
+        a, b, c, d = self.ids
+        load = self.graph._query
+
+        def load_then_follow(kind, user_id):
+            # The array is read before the new follow commits and is indexed after it
+            ids = load(kind, user_id)
+            Relationship.objects.create(from_user_id=c, to_user_id=d)
+            self.graph.add_edge(c, d)
+            return ids
+
+        with mock.patch.object(self.graph, '_query', load_then_follow):
+            self.assertEqual(list(self.graph.following(c)), [a])
+        self.assertIsNone(self.graph._cached((FOLLOWING, c)))
+        self.assertTrue(self.graph.follows(c, d))
+
+    def test_comment_needs_a_visible_post(self):
+        a, b, c, d = self.ids
+        follow_graph.clear()
+        self.addCleanup(follow_graph.clear)
+        posts = {
+            visibility: self.users[3].posts.create(content=visibility, visibility=visibility)
+            for visibility in ('followers', 'private')
+        }
+        client = APIClient()
+        client.force_authenticate(self.users[2])
+        create = lambda post: client.post('/api/comments/comments/', {'post': post.id, 'content': 'hi'})
+        self.assertEqual(create(posts['followers']).status_code, 400)
+        with self.captureOnCommitCallbacks(execute=True):
+            Relationship.objects.create(from_user_id=c, to_user_id=d)
+        self.assertEqual(create(posts['followers']).status_code, 201)
+        self.assertEqual(create(posts['private']).status_code, 400)
+
+        # An unfollow this process's graph hasn't heard of (made by another worker) still counts
+        self.assertTrue(follow_graph.follows(c, d))
+        Relationship.objects.filter(from_user_id=c, to_user_id=d).delete()
+        self.assertTrue(follow_graph.follows(c, d))
+        self.assertEqual(create(posts['followers']).status_code, 400)
 
-# Create your tests here.
@@ -1,6 +1,7 @@
 from rest_framework.routers import DefaultRouter
 from django.urls import include, path
 from .views import UserViewSet, ProfileViewSet
+from . import async_views
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 
 router = DefaultRouter()
@@ -10,5 +11,9 @@ router.register(r'profiles', ProfileViewSet, basename='profile')
 urlpatterns = [
     path('', include(router.urls)),
     path('auth/login/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
-    path('auth/refresh', TokenRefreshView.as_view(), name='token_refresh')
+    path('auth/refresh', TokenRefreshView.as_view(), name='token_refresh'),
+    # Async variants that hash passwords in a process pool (for ASGI deployments)
+    path('auth/async/login/', async_views.login, name='async_login'),
+    path('auth/async/register/', async_views.register, name='async_register'),
+    path('async/users/me/', async_views.me, name='async_user_me')
 ]
\ No newline at end of file
@@ -1,19 +1,39 @@
 from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from .models import User, Relationship, Profile
+from django.core.handlers.asgi import ASGIRequest
+from django.db import transaction
+from django.http import StreamingHttpResponse
+from .models import User, Relationship, Profile, UserStats
 from .serializers import (
     UserSerializer,
     UserListSerializer,
+    user_list_rows,
     PublicUserSerializer,
     PasswordChangeSerializer,
     EmailVerificationTokenSerializer,
     ProfileSerializer
 )
 from .permissions import IsOwner
+from .export import export_lines, aexport_lines
+from apps.core.pagination import DateJoinedCursorPagination
+from apps.core.renderers import ORJSONRenderer, NDJSONRenderer
+from apps.core import cache as response_cache
+from apps.core.serializers import expands, wants
 
 class UserViewSet(viewsets.ModelViewSet):
-    queryset = User.objects.all().order_by('-date_joined')
+    queryset = User.objects.order_by('-date_joined')
+    pagination_class = DateJoinedCursorPagination
+
+    def get_queryset(self):
+        # Join only what ?fields= / ?expand= will render
+        queryset = super().get_queryset()
+        params = self.request.query_params
+        if wants(params, 'post_count', 'follower_count', 'following_count'):
+            queryset = queryset.select_related('stats')
+        if expands(params, 'profile'):
+            queryset = queryset.select_related('profile')
+        return queryset
 
     def get_serializer_class(self):
         if self.action == 'list':
@@ -39,6 +59,32 @@ class UserViewSet(viewsets.ModelViewSet):
             return [permissions.IsAdminUser()]
         return super().get_permissions()
     
+    def list(self, request, *args, **kwargs):
+        # Rows straight from values_list(); ?expand= needs the real serializers
+        if 'expand' in request.query_params:
+            return super().list(request, *args, **kwargs)
+        return user_list_rows.list_response(self)
+
+    def retrieve(self, request, *args, **kwargs):
+        pk, variant = kwargs['pk'], response_cache.request_variant(request)
+        # Sparse reads skip the cache, which only holds full bodies
+        cacheable = not {'fields', 'expand'} & request.query_params.keys()
+        data = response_cache.get_body('user', pk, variant) if cacheable else None
+        if data is not None:
+            # Object permissions only look at the user's identity
+            self.check_object_permissions(request, User(pk=data['id']))
+            return Response(data)
+
+        versions = response_cache.get_versions([
+            response_cache.version_key(User, pk),
+            response_cache.version_key(UserStats, pk)
+        ])
+        instance = self.get_object()
+        data = self.get_serializer(instance).data
+        if cacheable and pk == str(instance.pk):
+            response_cache.set_body('user', pk, data, versions, variant)
+        return Response(data)
+
     @action(detail=True, methods=['post'], url_path='change-password')
     def change_password(self, request, pk=None):
         serializer = PasswordChangeSerializer(data=request.data, context={'request': request})
@@ -48,15 +94,28 @@ class UserViewSet(viewsets.ModelViewSet):
     
     @action(detail=False, methods=['get'], permission_classes=[permissions.IsAuthenticated])
     def me(self, request):
-        serializer = PublicUserSerializer(request.user, context={'request': request})
+        # request.user only carries the fields authentication needs
+        user = self.get_queryset().get(pk=request.user.pk)
+        serializer = PublicUserSerializer(user, context={'request': request})
         return Response(serializer.data)
     
+    @action(detail=False, methods=['get'], permission_classes=[permissions.IsAuthenticated],
+            renderer_classes=[ORJSONRenderer, NDJSONRenderer], url_path='me/export')
+    def export(self, request):
+        # Streamed as it is read: posts, comments, likes and follows of the current user
+        lines = aexport_lines if isinstance(request._request, ASGIRequest) else export_lines
+        response = StreamingHttpResponse(lines(request.user.pk), content_type='application/x-ndjson')
+        response['Content-Disposition'] = f'attachment; filename="account-{request.user.pk}.ndjson"'
+        return response
+
     @action(detail=True, methods=['post'], permission_classes=[permissions.IsAuthenticated, IsOwner], url_path='follow')
     def follow(self, request, pk=None):
         target = self.get_object()
         if Relationship.objects.filter(from_user=request.user, to_user=target).exists():
             return Response({'detail': 'Already following.'}, status=status.HTTP_400_BAD_REQUEST)
-        Relationship.objects.create(from_user=request.user, to_user=target)
+        # Relationship row and both users' UserStats change in one transaction
+        with transaction.atomic():
+            Relationship.objects.create(from_user=request.user, to_user=target)
         return Response({'detail': 'Now following.'}, status=status.HTTP_200_OK)
     
     @action(detail=True, methods=['delete'], permission_classes=[permissions.IsAuthenticated, IsOwner], url_path='unfollow')
@@ -65,7 +124,8 @@ class UserViewSet(viewsets.ModelViewSet):
         rel = Relationship.objects.filter(from_user=request.user, to_user=target).first()
         if not rel:
             return Response({'detail': 'Not Following.'}, status=status.HTTP_400_BAD_REQUEST)
-        rel.delete()
+        with transaction.atomic():
+            rel.delete()
         return Response({'detail': 'Unfollowed.'}, status=status.HTTP_200_OK)
     
 class ProfileViewSet(viewsets.ModelViewSet):
@@ -31,27 +31,100 @@ INSTALLED_APPS = [
     'apps.users',
     'apps.posts',
     'apps.comments',
+    'apps.core',
+    'apps.hashtags',
     'rest_framework',
     'rest_framework_simplejwt'
 ]
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'apps.core.authentication.CachedJWTAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticatedOrReadOnly',
-    ]
+    ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'apps.core.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PAGINATION_CLASS': 'apps.core.pagination.CreatedAtCursorPagination',
+    'PAGE_SIZE': 20
 }
 
 from datetime import timedelta
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(minutes=60),
     'REFRESH_TOKEN_LIFETIME': timedelta(days=7),
-    'ROTATE_REFRESH_TOKENS': True
+    'ROTATE_REFRESH_TOKENS': True,
+    'TOKEN_OBTAIN_SERIALIZER': 'apps.users.serializers.ClaimsTokenObtainPairSerializer',
+    'TOKEN_REFRESH_SERIALIZER': 'apps.users.serializers.ClaimsTokenRefreshSerializer'
 }
 
+# Authenticated users (apps.core.authentication)
+# Cached per process for AUTH_USER_CACHE_TTL seconds. In stateless mode username,
+# role, is_active and is_staff come from the token, so a change to them only shows
+# up in tokens issued after it; refreshing re-reads them, so a token is at most
+# ACCESS_TOKEN_LIFETIME out of date.
+AUTH_USER_CACHE_TTL = 60
+AUTH_USER_CACHE_MAX_ENTRIES = 10000
+JWT_AUTH_STATELESS = False
+
+# Password hashing for the async login/registration views (apps.core.hashing):
+# a process pool of PASSWORD_HASH_WORKERS, at most PASSWORD_HASH_CONCURRENCY
+# hashes in flight per event loop, the rest wait without blocking it.
+PASSWORD_HASH_OFFLOAD = True
+PASSWORD_HASH_WORKERS = 2
+PASSWORD_HASH_CONCURRENCY = 4
+
+# Home feed
+# Posts are pushed into followers' timelines by a background fan-out step, when created and
+# whenever a private post is shared; authors with more followers than
+# FEED_FANOUT_MAX_FOLLOWERS are merged in on read.
+FEED_PAGE_SIZE = 20
+FEED_FANOUT_MAX_FOLLOWERS = 5000
+FEED_FANOUT_ASYNC = True
+FEED_FANOUT_WORKERS = 2
+FEED_BACKFILL_POSTS = 20
+
+# Largest batch accepted by /posts/bulk/ (ids to fetch or posts to create)
+POST_BULK_MAX_ITEMS = 100
+
+# Buffered like toggles (apps.posts.likes): off by default; when enabled, like/unlike
+# taps are coalesced in memory and flushed in batches every LIKE_BUFFER_FLUSH_INTERVAL seconds.
+LIKE_BUFFER_ENABLED = False
+LIKE_BUFFER_FLUSH_INTERVAL = 1.0
+LIKE_BUFFER_MAX_PENDING = 5000
+
+# Hashtag trending: public posts count their tags in the HASHTAG_BUCKET_SECONDS bucket
+# they were created in, and trending sums the last HASHTAG_TRENDING_WINDOW_HOURS.
+HASHTAG_BUCKET_SECONDS = 3600
+HASHTAG_TRENDING_WINDOW_HOURS = 24
+
+# Process-local follow graph index (apps.users.graph). Another worker's follows reach it
+# within FOLLOW_GRAPH_TTL seconds, so it serves reads, never access checks.
+FOLLOW_GRAPH_MAX_IDS = 2_000_000
+FOLLOW_GRAPH_TTL = 300
+
+# Account export (apps.users.export): rows read per query chunk and per streamed chunk
+ACCOUNT_EXPORT_CHUNK_SIZE = 2000
+
+# Per-request query count, SQL time and N+1 warnings (apps.core.middleware); off unless enabled.
+# A query fingerprint run SQL_N_PLUS_ONE_THRESHOLD times in one request is logged as a suspected N+1.
+SQL_INSTRUMENTATION = False
+SQL_N_PLUS_ONE_THRESHOLD = 5
+
+# Prometheus metrics at /metrics (apps.core.metrics). With several worker processes, point
+# METRICS_DIR at a directory they share: each writes its totals there every
+# METRICS_FLUSH_INTERVAL seconds and a scrape of any worker sums them all.
+METRICS_ENABLED = True
+METRICS_DIR = None
+METRICS_FLUSH_INTERVAL = 5
+METRICS_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
 MIDDLEWARE = [
+    'apps.core.middleware.MetricsMiddleware',
+    'apps.core.middleware.QueryInstrumentationMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -92,6 +165,22 @@ DATABASES = {
 }
 
 
+# Cache
+# LocMemCache is per process: with several workers use a shared backend (Redis,
+# Memcached) so version bumps from one worker invalidate bodies cached by the others.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    }
+}
+
+# Post and user detail bodies, keyed by per-row versions (apps.core.cache)
+RESPONSE_CACHE_ALIAS = 'default'
+RESPONSE_CACHE_TIMEOUT = 300
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -128,6 +217,32 @@ USE_TZ = True
 
 STATIC_URL = 'static/'
 
+# Uploaded files (post images, avatars and their resized variants)
+
+MEDIA_URL = 'media/'
+MEDIA_ROOT = BASE_DIR / 'media'
+
+# Image variants are rendered off the request thread in a process pool (apps.core.images)
+IMAGE_VARIANT_SIZES = {'thumb': 150, 'medium': 600}
+IMAGE_VARIANT_FORMATS = ['webp', 'jpeg']
+IMAGE_VARIANT_QUALITY = 82
+IMAGE_PIPELINE_ASYNC = True
+IMAGE_PROCESS_WORKERS = 2
+
+# Image uploads are checked while streaming (apps.core.uploads): byte caps per form
+# field, plus format and dimensions read from the header before the rest is buffered.
+FILE_UPLOAD_HANDLERS = [
+    'apps.core.uploads.ImageUploadHandler',
+    'django.core.files.uploadhandler.MemoryFileUploadHandler',
+    'django.core.files.uploadhandler.TemporaryFileUploadHandler',
+]
+IMAGE_UPLOAD_MAX_BYTES = {
+    'avatar': 2 * 1024 * 1024,
+    'image': 5 * 1024 * 1024,
+}
+IMAGE_UPLOAD_FORMATS = ['JPEG', 'PNG', 'WEBP', 'GIF']
+IMAGE_UPLOAD_MAX_DIMENSION = 8000
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
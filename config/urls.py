@@ -1,9 +1,17 @@
+from django.conf import settings
+from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import path, include
+from apps.core.views import metrics_view
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/users/', include('apps.users.urls')),
     path('api/posts/', include('apps.posts.urls')),
-    path('api/comments/', include('apps.comments.urls'))
+    path('api/comments/', include('apps.comments.urls')),
+    path('api/hashtags/', include('apps.hashtags.urls')),
+    path('metrics', metrics_view, name='metrics')
 ]
+
+if settings.DEBUG:
+    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)